@@ -0,0 +1,228 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError, wait
+import pandas as pd
+import config
+from utils.llm import DeadlineExceeded, TransientLLMError
+from utils.router import ROUTES
+
+# Shared pool: a stage that times out keeps running in its thread until the
+# network call returns, so the pool is sized for a few abandoned calls.
+_executor = ThreadPoolExecutor(max_workers=config.ORCHESTRATOR_WORKERS, thread_name_prefix="agent")
+
+TIMEOUT_SQL_RESPONSE = {"query": None, "results": "The database query did not finish in time."}
+TIMEOUT_RAG_RESPONSE = {"response": "The document search did not finish in time.", "source_documents": []}
+SKIPPED_SQL_RESPONSE = {"query": None, "results": "Not needed for this question."}
+SKIPPED_RAG_RESPONSE = {"response": "Not needed for this question.", "source_documents": []}
+
+
+class Orchestrator:
+    """
+    Runs the SQL and RAG agents concurrently, builds the chart as soon as the
+    SQL results arrive, then runs synthesis once both branches are ready.
+
+    Every stage has a deadline (config.STAGE_TIMEOUTS). A stage that misses
+    it is replaced by a placeholder so the pipeline still returns a partial
+    answer. The deadline is also passed to the agent, so its LLM calls stop
+    retrying once the stage has been given up on; their DeadlineExceeded
+    counts as a timeout. `on_stage(stage, state)` is called from the calling thread with
+    state in "started", "done", "timeout" or "error", so it can drive UI.
+
+    With `stream=True` synthesis is not run: the result holds an
+    `answer_stream` generator instead, which records time-to-first-visible
+    token and total latency in `timings` as it is consumed.
+
+    With a `router` (utils.router.QueryRouter) only the agents the question
+    needs run: the others are replaced by a "not needed" placeholder.
+    """
+
+    def __init__(self, rag, sql_agent, viz, synth, timeouts=None, router=None):
+        self.rag = rag
+        self.sql_agent = sql_agent
+        self.viz = viz
+        self.synth = synth
+        self.router = router
+        self.timeouts = {**config.STAGE_TIMEOUTS, **(timeouts or {})}
+
+    def run(self, query, on_stage=None, stream=False):
+        on_stage = on_stage or (lambda stage, state: None)
+        result = {
+            "sql_response": TIMEOUT_SQL_RESPONSE,
+            "rag_response": TIMEOUT_RAG_RESPONSE,
+            "df_results": None,
+            "viz_type": None,
+            "chart": None,
+            "answer": None,
+            "answer_stream": None,
+            "timings": {},
+            "timed_out": [],
+            "errors": [],
+            "route": "all",
+        }
+        start = time.monotonic()
+
+        # 0. Agents needed for this question
+        if self.router is not None:
+            result["route"] = self.router.route(query)
+            result["timings"]["route"] = time.monotonic() - start
+            print(f"Route: {result['route']} ({1000 * result['timings']['route']:.1f} ms)")
+        stages = ROUTES[result["route"]]
+        if "sql" not in stages:
+            result["sql_response"] = SKIPPED_SQL_RESPONSE
+        if "rag" not in stages:
+            result["rag_response"] = SKIPPED_RAG_RESPONSE
+
+        # 1. Independent branches: SQL and RAG in parallel
+        pending = {}
+        for stage, fn in (("sql", self.sql_agent.process), ("rag", self.rag.process)):
+            if stage not in stages:
+                continue
+            on_stage(stage, "started")
+            deadline = start + self.timeouts[stage]
+            future = _executor.submit(fn, query, deadline=deadline)
+            pending[future] = (stage, deadline)
+
+        while pending:
+            next_deadline = min(deadline for _, deadline in pending.values())
+            done, _ = wait(pending, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, _ = pending.pop(future)
+                result["timings"][stage] = time.monotonic() - start
+                try:
+                    result[f"{stage}_response"] = future.result()
+                    on_stage(stage, "done")
+                    if self.router is not None:
+                        self.router.record_stage(stage, result["timings"][stage])
+                except DeadlineExceeded:
+                    result["timed_out"].append(stage)
+                    on_stage(stage, "timeout")
+                except Exception as e:
+                    print(f"Stage {stage} failed: {e}")
+                    result[f"{stage}_response"] = self._error_response(stage, e)
+                    result["errors"].append(stage)
+                    on_stage(stage, "error")
+                if stage == "sql":
+                    # Chart while RAG is still running
+                    self._run_viz(result, on_stage, chart="viz" in stages)
+
+            now = time.monotonic()
+            for future, (stage, deadline) in list(pending.items()):
+                if deadline <= now:
+                    future.cancel()
+                    del pending[future]
+                    result["timed_out"].append(stage)
+                    on_stage(stage, "timeout")
+
+        # 2. Synthesis as soon as both inputs are available
+        on_stage("synthesis", "started")
+        if stream:
+            result["answer_stream"] = self._stream_answer(query, result, start)
+            return result
+        synth_start = time.monotonic()
+        future = _executor.submit(
+            self.synth.process, query, result["rag_response"], result["sql_response"], result["viz_type"],
+            deadline=synth_start + self.timeouts["synthesis"]
+        )
+        try:
+            result["answer"] = future.result(timeout=self.timeouts["synthesis"])
+            on_stage("synthesis", "done")
+        except (TimeoutError, DeadlineExceeded):
+            future.cancel()
+            result["timed_out"].append("synthesis")
+            result["answer"] = self._partial_answer(result)
+            on_stage("synthesis", "timeout")
+        except Exception as e:
+            result["answer"] = f"Error during synthesis: {str(e)}"
+            result["errors"].append("synthesis")
+            on_stage("synthesis", "error")
+        result["timings"]["synthesis"] = time.monotonic() - synth_start
+        result["timings"]["total"] = time.monotonic() - start
+        return result
+
+    def _produce_stream(self, stream, pieces, stop):
+        # Worker side of _stream_answer: forwards pieces until the consumer stops
+        try:
+            for piece in stream:
+                if stop.is_set():
+                    break
+                pieces.put(("piece", piece))
+            pieces.put(("done", None))
+        except Exception as e:
+            pieces.put(("error", e))
+        finally:
+            stream.close()
+
+    def _stream_answer(self, query, result, start):
+        # The stream is read in a worker through a queue, so the synthesis
+        # deadline holds even when no token arrives. A stream that fails
+        # because of the deadline counts as a timeout too
+        timings = result["timings"]
+        synth_start = time.monotonic()
+        deadline = synth_start + self.timeouts["synthesis"]
+        pieces = queue.Queue()
+        stop = threading.Event()
+        stream = self.synth.process_stream(
+            query, result["rag_response"], result["sql_response"], result["viz_type"], deadline=deadline
+        )
+        _executor.submit(self._produce_stream, stream, pieces, stop)
+        try:
+            while True:
+                try:
+                    kind, value = pieces.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    kind, value = "error", DeadlineExceeded("synthesis stream deadline passed")
+                if kind == "error" and (isinstance(value, DeadlineExceeded) or (
+                        isinstance(value, TransientLLMError) and time.monotonic() >= deadline)):
+                    result["timed_out"].append("synthesis")
+                    if "first_token" in timings:
+                        yield "\n\n*The answer was cut short because it took too long.*"
+                    else:
+                        yield self._partial_answer(result)
+                    break
+                if kind == "done":
+                    break
+                if kind == "error":
+                    result["errors"].append("synthesis")
+                    yield f"Error during synthesis: {str(value)}"
+                    break
+                if "first_token" not in timings:
+                    timings["synthesis_first_token"] = time.monotonic() - synth_start
+                    timings["first_token"] = time.monotonic() - start
+                yield value
+        finally:
+            stop.set()
+            timings["synthesis"] = time.monotonic() - synth_start
+            timings["total"] = time.monotonic() - start
+
+    def _run_viz(self, result, on_stage, chart=True):
+        sql_results = result["sql_response"].get("results")
+        if not isinstance(sql_results, pd.DataFrame) or sql_results.empty:
+            return
+        result["df_results"] = sql_results
+        if not chart:
+            return
+        on_stage("viz", "started")
+        viz_start = time.monotonic()
+        result["viz_type"] = self.viz.determine_chart_type(result["sql_response"]["query"], sql_results)
+        result["chart"] = self.viz.create_chart(sql_results, result["viz_type"])
+        result["timings"]["viz"] = time.monotonic() - viz_start
+        if self.router is not None:
+            self.router.record_stage("viz", result["timings"]["viz"])
+        on_stage("viz", "done")
+
+    def _error_response(self, stage, error):
+        if stage == "sql":
+            return {"query": None, "results": f"Error executing query: {error}"}
+        return {"response": f"Error during document search: {error}", "source_documents": []}
+
+    def _partial_answer(self, result):
+        # Synthesis missed its deadline: return what the other stages produced
+        parts = ["*The full answer took too long; here are the partial results.*"]
+        rag_text = result["rag_response"].get("response")
+        if rag_text and "rag" not in result["timed_out"]:
+            parts.append(rag_text)
+        if result["df_results"] is not None:
+            parts.append("See the data excerpt and chart below.")
+        return "\n\n".join(parts)
@@ -1,60 +1,62 @@
 
-import sqlite3
-import os
-from groq import Groq
-import config
 from utils.embeddings import EmbeddingEngine
+from utils.retrieval import HybridRetriever
+from utils.metadata_filter import parse_filters
+from utils.db import get_connection
+from utils.llm import get_gateway
 from utils import prompts
+from utils.token_budget import pack_blocks, prompt_messages, section_budget
 
 class RAGAgent:
-    def __init__(self):
+    def __init__(self, llm=None):
         self.embedding_engine = EmbeddingEngine()
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+        self.retriever = HybridRetriever(self.embedding_engine)
+        self.llm = llm or get_gateway()
 
     def get_documents(self, standard_ids):
+        """id, title_en and abstract of each standard, in rank order."""
         if not standard_ids:
             return []
-            
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+
+        # In-process document store: no SQL round trip (rows and store from the same snapshot)
+        snapshot = self.embedding_engine.snapshot
+        if snapshot.doc_store is not None:
+            rows = snapshot.rows_of(standard_ids)
+            return snapshot.doc_store.get([row for row in rows if row is not None])
+
+        # Vector index built without document columns: fetch from SQLite
+        conn = get_connection()
         placeholders = ','.join('?' * len(standard_ids))
         
         cursor = conn.execute(
-            f"SELECT * FROM standards WHERE id IN ({placeholders})",
+            f"SELECT id, title_en, abstract FROM standards WHERE id IN ({placeholders})",
             standard_ids
         )
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        by_id = {row[0]: {"id": row[0], "title_en": row[1], "abstract": row[2]} for row in cursor.fetchall()}
+        return [by_id[doc_id] for doc_id in standard_ids if doc_id in by_id]
 
-    def process(self, query):
-        # 1. Search relevant IDs
-        top_ids = self.embedding_engine.search(query)
+    def process(self, query, deadline=None):
+        # 1. Search relevant IDs (dense + BM25 fused), restricted to the
+        # committee / ICS / years stated in the question if any
+        filters = parse_filters(query)
+        top_ids = self.retriever.search(query, filters=filters)
+        if not top_ids and filters:
+            top_ids = self.retriever.search(query)
         
         # 2. Get full content
         docs = self.get_documents(top_ids)
         
-        # 3. Format context
-        context = "\n\n".join([
+        # 3. Format context, abstracts cut to share the token budget
+        context = pack_blocks([
             f"Ref: ISO {d['id']}\nTitle: {d['title_en']}\nAbstract: {d['abstract']}" 
             for d in docs
-        ])
+        ], section_budget("rag", "context"))
         
         # 4. Generate answer
-        completion = self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": prompts.RAG_PROMPT.format(query=query, context=context)},
-                {"role": "user", "content": query}
-            ],
-            model=config.GROQ_MODEL,
+        response = self.llm.complete(
+            prompt_messages("rag", prompts.RAG_PROMPT, query, context=context), purpose="rag", deadline=deadline
         )
         
-        response = completion.choices[0].message.content
-        
-        # Clean up thinking blocks from Qwen3 (e.g., <think>...</think>)
-        import re
-        response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL).strip()
-        
         return {
             "response": response,
             "source_documents": docs
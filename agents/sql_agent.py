@@ -1,40 +1,57 @@
 
-import sqlite3
+import re
+import time
 import pandas as pd
-import os
-from groq import Groq
 import config
 from utils import prompts
+from utils.token_budget import prompt_messages
+from utils.db import execute_guarded
+from utils.llm import get_gateway
+from utils.sql_cache import SQLResultCache
+from utils.sql_templates import TemplateStats, match_template
 
 class SQLAgent:
-    def __init__(self):
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    def __init__(self, llm=None):
+        self.llm = llm or get_gateway()
+        self.result_cache = SQLResultCache()
+        self.template_stats = TemplateStats()
 
     def execute_query(self, sql_query):
+        return self.execute_query_with_meta(sql_query)[0]
+
+    def execute_query_with_meta(self, sql_query):
+        """
+        Run generated SQL under a time budget and row cap. Returns
+        (DataFrame or error string, metadata about truncation/timeouts).
+        """
+        cached = self.result_cache.get(sql_query)
+        if cached is not None:
+            df, meta = cached
+            return df, {**meta, "cached": True}
         try:
-            conn = sqlite3.connect(config.DB_PATH)
-            df = pd.read_sql_query(sql_query, conn)
-            conn.close()
-            return df
+            columns, rows, meta = execute_guarded(sql_query)
         except Exception as e:
-            return f"Error executing query: {e}"
+            return f"Error executing query: {e}", {"error": str(e)}
+        if meta["timed_out"] and not rows:
+            return f"Error executing query: exceeded the {config.SQL_TIMEOUT}s time budget", meta
+        
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        # Long text cells (e.g. full_text from SELECT *) would bloat the synthesis prompt
+        for col in df.select_dtypes(include="object").columns:
+            df[col] = df[col].map(
+                lambda v: v[:config.SQL_MAX_CELL_CHARS] + "…"
+                if isinstance(v, str) and len(v) > config.SQL_MAX_CELL_CHARS else v
+            )
+        if not meta["timed_out"]:
+            self.result_cache.put(sql_query, df, meta)
+        return df, meta
 
-    def process(self, query):
-        # 1. Generate SQL
-        completion = self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": prompts.SQL_PROMPT.format(query=query)},
-                {"role": "user", "content": query}
-            ],
-            model=config.GROQ_MODEL,
+    def generate_sql(self, query, deadline=None):
+        # Think blocks (Qwen3) are removed by the gateway
+        generated_sql = self.llm.complete(
+            prompt_messages("sql", prompts.SQL_PROMPT, query), purpose="sql", deadline=deadline
         )
         
-        generated_sql = completion.choices[0].message.content.strip()
-        
-        # Clean up potential thinking blocks from Qwen3 (e.g., <think>...</think>)
-        import re
-        generated_sql = re.sub(r'<think>.*?</think>', '', generated_sql, flags=re.DOTALL).strip()
-        
         # Clean up potential markdown code blocks
         if "```sql" in generated_sql:
             generated_sql = generated_sql.split("```sql")[1].split("```")[0].strip()
@@ -48,13 +65,40 @@ class SQLAgent:
         
         # Remove any leading/trailing quotes that some models add
         generated_sql = generated_sql.strip('"').strip("'")
-            
-        print(f"Generated SQL: {generated_sql}")
         
-        # 2. Execute SQL
-        results = self.execute_query(generated_sql)
+        return generated_sql
+
+    def process(self, query, deadline=None):
+        # 1. Local template for common analytics intents, counted as a hit only once it ran
+        start = time.perf_counter()
+        match = match_template(query) if config.SQL_TEMPLATES_ENABLED else None
+        if match:
+            match_seconds = time.perf_counter() - start
+            results, execution = self.execute_query_with_meta(match.sql)
+            if isinstance(results, pd.DataFrame):
+                generated_sql = match.sql
+                saved = self.template_stats.record_template(match.name, match_seconds)
+                saved_text = f", saved ~{saved:.2f}s" if saved is not None else ""
+                print(f"Template SQL ({match.name}{saved_text}): {generated_sql}")
+            else:
+                # e.g. a database built before the summary tables existed
+                print(f"Template {match.name} failed ({results}), falling back to LLM")
+                match = None
+        
+        # 2. Otherwise generate SQL with the LLM and execute it
+        if not match:
+            start = time.perf_counter()
+            generated_sql = self.generate_sql(query, deadline)
+            self.template_stats.record_llm(time.perf_counter() - start)
+            print(f"Generated SQL: {generated_sql}")
+            results, execution = self.execute_query_with_meta(generated_sql)
+        
+        if execution.get("truncated") or execution.get("timed_out"):
+            print(f"SQL result limited: {execution}")
         
         return {
             "query": generated_sql,
-            "results": results
+            "results": results,
+            "template": match.name if match else None,
+            "execution": execution
         }
@@ -1,48 +1,56 @@
 
-import os
 import pandas as pd
-from groq import Groq
-import config
 from utils import prompts
+from utils.llm import get_gateway
+from utils.token_budget import estimate_tokens, prompt_messages, section_budget, summarize_dataframe
 
 class SynthesisAgent:
-    def __init__(self):
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    def __init__(self, llm=None):
+        self.llm = llm or get_gateway()
 
-    def process(self, query, rag_response, sql_response, viz_type=None):
+    def build_messages(self, query, rag_response, sql_response, viz_type=None):
         # Format RAG results
         rag_text = rag_response.get("response", "No documents found.")
         
         # Format SQL results
         sql_data = sql_response.get("results")
         if isinstance(sql_data, pd.DataFrame):
+            execution = sql_response.get("execution") or {}
+            if execution.get("timed_out"):
+                note = f"\n(Partial result: the query hit its time limit after {len(sql_data)} rows.)"
+            elif execution.get("truncated"):
+                note = f"\n(Result truncated to the first {len(sql_data)} rows.)"
+            else:
+                note = ""
             if sql_data.empty:
                 sql_text = "No statistical data found."
             else:
-                sql_text = sql_data.to_markdown(index=False)
+                # Large results: first / last rows and column statistics
+                budget = section_budget("synthesis", "sql_results")
+                if budget is not None:
+                    budget -= estimate_tokens(note)
+                sql_text = summarize_dataframe(sql_data, budget)
+            sql_text += note
         else:
             sql_text = str(sql_data)
             
         viz_text = f"An interactive {viz_type} chart was generated." if viz_type else "No visualization generated."
         
-        # Generate final answer
-        completion = self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": prompts.SYNTHESIS_PROMPT.format(
-                    query=query,
-                    rag_results=rag_text,
-                    sql_results=sql_text,
-                    viz_description=viz_text
-                )},
-                {"role": "user", "content": query}
-            ],
-            model=config.GROQ_MODEL,
+        return prompt_messages(
+            "synthesis", prompts.SYNTHESIS_PROMPT, query,
+            rag_results=rag_text,
+            sql_results=sql_text,
+            viz_description=viz_text
+        )
+
+    def process(self, query, rag_response, sql_response, viz_type=None, deadline=None):
+        # Generate final answer (think blocks removed by the gateway)
+        return self.llm.complete(
+            self.build_messages(query, rag_response, sql_response, viz_type), purpose="synthesis", deadline=deadline
+        )
+
+    def process_stream(self, query, rag_response, sql_response, viz_type=None, deadline=None):
+        """Yield the visible answer as tokens arrive, with think blocks removed."""
+        yield from self.llm.stream(
+            self.build_messages(query, rag_response, sql_response, viz_type), purpose="synthesis", deadline=deadline
         )
-        
-        response = completion.choices[0].message.content
-        
-        # Clean up thinking blocks from Qwen3 (e.g., <think>...</think>)
-        import re
-        response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL).strip()
-        
-        return response
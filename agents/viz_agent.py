@@ -1,5 +1,4 @@
 
-import plotly.express as px
 import pandas as pd
 
 class VizAgent:
@@ -8,6 +7,9 @@ class VizAgent:
         if dataframe is None or dataframe.empty:
             return None
             
+        # plotly is only needed once a chart is actually drawn
+        import plotly.express as px
+
         try:
             if chart_type == "timeline":
                 # If we have a 'count' column, line chart is great
@@ -1,10 +1,13 @@
 
 import streamlit as st
-import pandas as pd
 import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
+import config
+from utils.startup import startup_timer
+from utils.llm import get_gateway
 
 # Load environment variables
 load_dotenv()
@@ -16,22 +19,16 @@ if "GROQ_API_KEY" in st.secrets:
 def check_and_prepare_data():
     """Check if data files exist (required for app to run)."""
     db_path = Path("iso_standards.db")
-    embeddings_path = Path("embeddings.npy")
+    embeddings_path = Path(config.VECTOR_INDEX_PATH)
     
     if not db_path.exists() or not embeddings_path.exists():
-        st.error("❌ Vital data files missing (iso_standards.db or embeddings.npy).")
+        st.error("❌ Vital data files missing (iso_standards.db or vector_index.bin).")
         st.error("This app expects pre-computed data. Please ensure these files are committed to the repository.")
         st.stop()
 
 # Run data check
 check_and_prepare_data()
 
-# Import agents (after data is ready)
-from agents.rag_agent import RAGAgent
-from agents.sql_agent import SQLAgent
-from agents.viz_agent import VizAgent
-from agents.synthesis_agent import SynthesisAgent
-
 # Page config
 st.set_page_config(
     page_title="ISO Standards AI Assistant",
@@ -97,12 +94,9 @@ if "messages" not in st.session_state:
 # Helper to get actual standards count
 def get_standards_count():
     try:
-        import sqlite3
-        conn = sqlite3.connect('iso_standards.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT count(*) FROM standards")
+        from utils.db import get_connection
+        cursor = get_connection().execute("SELECT count(*) FROM standards")
         count = cursor.fetchone()[0]
-        conn.close()
         return count
     except:
         return 0
@@ -148,11 +142,86 @@ with st.sidebar:
     """)
 
 # Initialize Agents
-@st.cache_resource
 def load_agents():
-    return RAGAgent(), SQLAgent(), VizAgent(), SynthesisAgent()
+    # Heavy imports (numpy, pandas, groq, plotly, sentence_transformers) happen here,
+    # after the data check, and each step is timed for the startup report
+    with startup_timer.step("import agents.rag_agent"):
+        from agents.rag_agent import RAGAgent
+    with startup_timer.step("import agents.sql_agent"):
+        from agents.sql_agent import SQLAgent
+    with startup_timer.step("import agents.viz_agent"):
+        from agents.viz_agent import VizAgent
+    with startup_timer.step("import agents.synthesis_agent"):
+        from agents.synthesis_agent import SynthesisAgent
+    from utils.semantic_cache import SemanticCache
+    from utils.router import QueryRouter
+
+    with startup_timer.step("init RAGAgent (embeddings)"):
+        rag = RAGAgent()
+    with startup_timer.step("init SQLAgent"):
+        sql_agent = SQLAgent()
+    with startup_timer.step("init VizAgent"):
+        viz = VizAgent()
+    with startup_timer.step("init SynthesisAgent"):
+        synth = SynthesisAgent()
+
+    # Warm up the embedding model so the first question does not pay for it
+    rag.embedding_engine.model
+    with startup_timer.step("import plotly.express"):
+        import plotly.express
+
+    with startup_timer.step("init SemanticCache"):
+        answer_cache = SemanticCache(rag.embedding_engine)
+    with startup_timer.step("init QueryRouter (example embeddings)"):
+        router = QueryRouter(rag.embedding_engine).fit() if config.ROUTER_ENABLED else None
+
+    print("Startup timings:\n" + startup_timer.report())
+    return rag, sql_agent, viz, synth, answer_cache, router
 
-rag, sql_agent, viz, synth = load_agents()
+@st.cache_resource
+def start_agents():
+    # LAZY_STARTUP: load in a background thread so the UI renders immediately
+    if config.LAZY_STARTUP:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-loader")
+        return executor.submit(load_agents)
+    future = Future()
+    try:
+        future.set_result(load_agents())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def get_agents():
+    """Loaded agents, or None after showing why loading failed (the next rerun retries)."""
+    try:
+        return agents_future.result()
+    except Exception as e:
+        # Don't keep serving the failed future from the resource cache
+        start_agents.clear()
+        st.error(f"❌ Could not load the agents: {e}")
+        return None
+
+agents_future = start_agents()
+
+with st.sidebar:
+    if not agents_future.done():
+        st.caption("⏳ Loading models in the background...")
+    with st.expander("Startup timings"):
+        st.code(startup_timer.report())
+    _agents = get_agents() if agents_future.done() else None
+    if _agents is not None:
+        _rag, _sql_agent, _, _, _answer_cache, _router = _agents
+        with st.expander("Cache & fast-path stats"):
+            st.json({
+                "query_cache": _rag.embedding_engine.cache.stats(),
+                "sql_result_cache": _sql_agent.result_cache.stats(),
+                "sql_templates": _sql_agent.template_stats.stats(),
+                "answer_cache": _answer_cache.stats(),
+                "document_store": _rag.embedding_engine.doc_store.stats()
+                if _rag.embedding_engine.doc_store is not None else None,
+                "router": _router.stats() if _router is not None else None,
+                "llm": get_gateway().stats(),
+            })
 
 # Check API Key to block main UI if missing
 if not os.environ.get("GROQ_API_KEY"):
@@ -245,54 +314,81 @@ if final_query:
     st.session_state.messages.append({"role": "user", "content": final_query})
     
     # 2. Generate Assistant Response
+    from agents.orchestrator import Orchestrator
+
     with st.chat_message("assistant"):
         with st.status("Analyzing...", expanded=True) as status:
             
-            # --- AGENT EXECUTION ---
-            
-            # 1. SQL Agent
-            status.write("🔍 Querying database...")
-            sql_response = sql_agent.process(final_query)
+            if not agents_future.done():
+                status.write("⏳ Loading models...")
+            agents = get_agents()
+            if agents is None:
+                status.update(label="Agents unavailable", state="error")
+                st.stop()
+            rag, sql_agent, viz, synth, answer_cache, router = agents
             
-            # 2. RAG Agent
-            status.write("📚 Searching texts...")
-            rag_response = rag.process(final_query)
+            # Paraphrases of an earlier question are answered without any LLM call
+            cached = answer_cache.lookup(final_query)
             
-            # 3. Visualization
-            status.write("📊 Generating charts...")
-            df_results = None
-            chart = None
-            viz_type = None
-            
-            if isinstance(sql_response.get("results"), pd.DataFrame) and not sql_response["results"].empty:
-                df_results = sql_response["results"]
-                viz_type = viz.determine_chart_type(sql_response["query"], df_results)
-                chart = viz.create_chart(df_results, viz_type)
-            
-            # 4. Synthesis
-            status.write("✍️ Drafting response...")
-            try:
-                final_answer = synth.process(final_query, rag_response, sql_response, viz_type)
-            except Exception as e:
-                final_answer = f"Error during synthesis: {str(e)}"
+            if cached is not None:
+                msg_payload, matched_question, similarity = cached
+                status.write(f"⚡ Answered from cache (similar to \"{matched_question}\", {similarity:.0%} match)")
+            else:
+                # --- AGENT EXECUTION ---
+                # SQL and RAG run concurrently; chart and synthesis follow as soon as their inputs are ready
+                stage_messages = {
+                    ("sql", "started"): "🔍 Querying database...",
+                    ("rag", "started"): "📚 Searching texts...",
+                    ("viz", "started"): "📊 Generating charts...",
+                    ("synthesis", "started"): "✍️ Drafting response...",
+                    ("sql", "timeout"): "⏱️ Database query timed out, continuing without it.",
+                    ("rag", "timeout"): "⏱️ Text search timed out, continuing without it.",
+                    ("synthesis", "timeout"): "⏱️ Drafting timed out, showing partial results.",
+                }
+                
+                def on_stage(stage, state):
+                    if (stage, state) in stage_messages:
+                        status.write(stage_messages[(stage, state)])
+                
+                orchestrator = Orchestrator(rag, sql_agent, viz, synth, router=router)
+                result = orchestrator.run(final_query, on_stage=on_stage, stream=config.STREAM_SYNTHESIS)
+                
+                sql_response = result["sql_response"]
+                rag_response = result["rag_response"]
+                df_results = result["df_results"]
+                chart = result["chart"]
             
             status.update(label="Complete", state="complete", expanded=False)
             
-        # Display Final Answer
-        st.markdown(final_answer)
-        
-        # Display Chart if available
-        if chart:
-            st.plotly_chart(chart, use_container_width=True)
+        if cached is not None:
+            st.markdown(msg_payload["content"])
+            if msg_payload["chart"]:
+                st.plotly_chart(msg_payload["chart"], use_container_width=True)
+        else:
+            # Display Final Answer (progressively when streaming)
+            if result["answer_stream"] is not None:
+                final_answer = st.write_stream(result["answer_stream"])
+            else:
+                final_answer = result["answer"]
+                st.markdown(final_answer)
+            print(f"Stage timings: {result['timings']}")
+            
+            # Display Chart if available
+            if chart:
+                st.plotly_chart(chart, use_container_width=True)
+                
+            # Prepare message payload for history
+            msg_payload = {
+                "role": "assistant",
+                "content": final_answer,
+                "sql_query": sql_response.get("query"),
+                "df_head": df_results.head(10) if df_results is not None else None,
+                "chart": chart,
+                "sources": rag_response.get("source_documents", [])
+            }
             
-        # Prepare message payload for history
-        msg_payload = {
-            "role": "assistant",
-            "content": final_answer,
-            "sql_query": sql_response.get("query"),
-            "df_head": df_results.head(10) if df_results is not None else None,
-            "chart": chart,
-            "sources": rag_response.get("source_documents", [])
-        }
+            # Only complete answers are worth serving again
+            if not result["timed_out"] and not result["errors"]:
+                answer_cache.store(final_query, msg_payload)
         
-        st.session_state.messages.append(msg_payload)
+        st.session_state.messages.append(dict(msg_payload))
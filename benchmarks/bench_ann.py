@@ -0,0 +1,88 @@
+"""
+Benchmark: IVF index vs brute-force search (recall@k and latency).
+
+Uses the float32 vectors of a vector_index.bin (--index, see
+utils/vector_index.py) if given, otherwise a synthetic clustered corpus.
+
+    python benchmarks/bench_ann.py --rows 1000000 --dim 384
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.ann_index import IVFIndex, exact_search, recall_at_k
+from utils.vector_index import VectorIndexFile
+
+
+def synthetic_corpus(n_rows, dim, n_topics=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    vectors = np.empty((n_rows, dim), dtype=np.float32)
+    for start in range(0, n_rows, 100000):
+        block = topics[rng.integers(0, n_topics, min(100000, n_rows - start))]
+        block += 0.5 * rng.standard_normal(block.shape).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        vectors[start:start + len(block)] = block
+    return vectors
+
+
+def timed(fn, queries):
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append(fn(q))
+    elapsed = (time.perf_counter() - start) / len(queries)
+    return results, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--index', default=None, help="vector_index.bin to take the vectors from")
+    args = parser.parse_args()
+
+    if args.index:
+        embeddings = np.array(VectorIndexFile.open(args.index)["vectors"])
+    else:
+        embeddings = synthetic_corpus(args.rows, args.dim)
+    print(f"Corpus: {embeddings.shape}")
+
+    start = time.perf_counter()
+    index, order = IVFIndex.build(embeddings)
+    embeddings = embeddings.take(order, axis=0, out=np.empty_like(embeddings))
+    print(f"Index build: {time.perf_counter() - start:.1f}s ({index.n_lists} lists)")
+
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(len(embeddings), size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    # Former code path: full dot product + full argsort
+    def argsort_search(q):
+        return np.argsort(embeddings @ q)[-args.top_k:][::-1]
+
+    _, argsort_ms = timed(argsort_search, queries)
+    exact, exact_ms = timed(lambda q: exact_search(embeddings, q, args.top_k)[0], queries)
+    print(f"{'method':<16}{'recall@' + str(args.top_k):>10}{'ms/query':>10}")
+    print(f"{'argsort':<16}{1.0:>10.3f}{argsort_ms:>10.3f}")
+    print(f"{'exact':<16}{1.0:>10.3f}{exact_ms:>10.3f}")
+
+    for n_probe in (1, 2, 4, 8, 16, 32):
+        if n_probe > index.n_lists:
+            break
+        approx, ms = timed(lambda q: index.search(embeddings, q, args.top_k, n_probe=n_probe)[0], queries)
+        recall = np.mean([recall_at_k(a, e) for a, e in zip(approx, exact)])
+        print(f"{'ivf n_probe=' + str(n_probe):<16}{recall:>10.3f}{ms:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
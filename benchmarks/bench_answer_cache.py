@@ -0,0 +1,75 @@
+"""
+Check: the semantic answer cache never serves the answer of a question that
+differs only in a number or a standard / committee reference. Every
+question is embedded to the same vector, the worst case for similarity, so
+only the question's specifics can tell them apart. No model or data needed.
+Then times lookups in a full cache.
+
+    python benchmarks/bench_answer_cache.py --size 500 --repeat 2000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.semantic_cache import SemanticCache
+
+# (stored question, asked question, expected hit)
+CASES = [
+    ("How many standards were published in 2019?", "How many standards were published in 2020?", False),
+    ("What does ISO 9001 require?", "What does ISO 14001 require?", False),
+    ("Which standards does TC 307 own?", "Which standards does SC 307 own?", False),
+    ("Top 5 committees", "Top 10 committees", False),
+    ("Standards published between 2010 and 2015", "Standards published between 2010 and 2016", False),
+    ("How many standards were published in 2019?", "Number of standards published in 2019", True),
+    ("What does ISO 9001 require?", "What are the requirements of ISO 9001?", True),
+    ("What is ISO 22000?", "Explain ISO 22000", True),
+]
+
+
+class SameVectorEngine:
+    """Embedding engine stand-in: every question maps to the same unit vector."""
+
+    data_version = None
+
+    def check_data_version(self):
+        pass
+
+    def encode_query(self, question):
+        return np.full(8, 1 / np.sqrt(8), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=500, help="cache entries for the timing")
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = 0
+    for stored, asked, expected in CASES:
+        cache = SemanticCache(SameVectorEngine())
+        cache.store(stored, {"answer": stored})
+        hit = cache.lookup(asked) is not None
+        ok = hit == expected
+        failures += not ok
+        print(f"{'ok ' if ok else 'BAD'} {'hit ' if hit else 'miss'} {stored!r} -> {asked!r}")
+
+    cache = SemanticCache(SameVectorEngine(), maxsize=args.size)
+    for i in range(args.size):
+        cache.store(f"How many standards were published in {1000 + i}?", {"answer": i})
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        cache.lookup(f"How many standards were published in {1000 + i % args.size}?")
+    elapsed = time.perf_counter() - start
+    print(f"\n{1e6 * elapsed / args.repeat:.1f} us per lookup ({args.size} entries)")
+    if failures:
+        sys.exit(f"{failures} unexpected cache results")
+
+
+if __name__ == '__main__':
+    main()
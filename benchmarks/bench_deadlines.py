@@ -0,0 +1,82 @@
+"""
+Check: stage deadlines with LLM calls slower than the stage timeouts (fake
+backend of utils/llm.py, no network or API key needed). Every stage must be
+reported as timed out, never as an error, and the user must get the partial
+answer, with and without streaming. Runs several times since the failure
+mode is a race between the LLM call and the orchestrator's timer.
+
+    python benchmarks/bench_deadlines.py --runs 5 --latency 1.5 --timeout 1.0
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.orchestrator import Orchestrator
+from agents.sql_agent import SQLAgent
+from agents.synthesis_agent import SynthesisAgent
+from agents.viz_agent import VizAgent
+from utils.llm import FakeBackend, LLMGateway
+
+QUESTION = "Which standards cover drones and what do they require?"
+PARTIAL = "*The full answer took too long; here are the partial results.*"
+
+
+class SlowRAG:
+    """RAG stand-in without the vector index: only the LLM call matters here."""
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def process(self, query, deadline=None):
+        response = self.llm.complete([{"role": "system", "content": "Context"},
+                                      {"role": "user", "content": query}], purpose="rag", deadline=deadline)
+        return {"response": response, "source_documents": []}
+
+
+def check(result, answer, states):
+    problems = []
+    if result["errors"]:
+        problems.append(f"errors {result['errors']}")
+    if sorted(result["timed_out"]) != ["rag", "sql", "synthesis"]:
+        problems.append(f"timed out {result['timed_out']}")
+    if not answer.startswith(PARTIAL):
+        problems.append(f"answer {answer[:60]!r}")
+    if "error" in states.values():
+        problems.append(f"stage states {states}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=1.5, help="seconds per LLM call")
+    parser.add_argument('--timeout', type=float, default=1.0, help="seconds per stage")
+    args = parser.parse_args()
+
+    llm = LLMGateway(FakeBackend(latency=args.latency, jitter=0.0, seed=0))
+    timeouts = {"sql": args.timeout, "rag": args.timeout, "synthesis": args.timeout}
+    orchestrator = Orchestrator(SlowRAG(llm), SQLAgent(llm), VizAgent(), SynthesisAgent(llm), timeouts=timeouts)
+
+    failures = 0
+    for run in range(args.runs):
+        for stream in (False, True):
+            states = {}
+            start = time.perf_counter()
+            result = orchestrator.run(QUESTION, on_stage=states.__setitem__, stream=stream)
+            answer = "".join(result["answer_stream"]) if stream else result["answer"]
+            elapsed = time.perf_counter() - start
+            problems = check(result, answer, states)
+            failures += bool(problems)
+            mode = "stream" if stream else "block "
+            print(f"{'ok ' if not problems else 'BAD'} run {run} {mode} {elapsed:.2f}s {'; '.join(problems)}")
+
+    if failures:
+        sys.exit(f"{failures} runs reported an error instead of a timeout")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: fetching the top-k documents for the RAG context from SQLite
+(`SELECT *`, as before, and selecting only the needed columns) vs the
+in-process document store loaded from the vector index. Reports the memory
+footprint of the store, the bytes each method pulls per lookup and the
+lookup latency. Requires iso_standards.db and the vector index from
+prepare_data.py.
+
+    python benchmarks/bench_docstore.py --lookups 2000 --top-k 5
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.db import get_connection
+from utils.embeddings import EmbeddingEngine
+from utils.vector_index import decode_ids
+
+
+def sql_select_star(ids):
+    placeholders = ','.join('?' * len(ids))
+    cursor = get_connection().execute(f"SELECT * FROM standards WHERE id IN ({placeholders})", ids)
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def sql_columns(ids):
+    placeholders = ','.join('?' * len(ids))
+    cursor = get_connection().execute(
+        f"SELECT id, title_en, abstract FROM standards WHERE id IN ({placeholders})", ids
+    )
+    by_id = {row[0]: {"id": row[0], "title_en": row[1], "abstract": row[2]} for row in cursor.fetchall()}
+    return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+
+def payload_bytes(docs):
+    return sum(len(str(value).encode("utf-8")) for doc in docs for value in doc.values() if value is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = EmbeddingEngine()
+    store = engine.doc_store
+    if store is None:
+        sys.exit("Vector index has no document columns, rebuild it with prepare_data.py")
+    all_ids = decode_ids(engine.ids)
+    rng = random.Random(0)
+    lookups = [rng.sample(all_ids, args.top_k) for _ in range(args.lookups)]
+
+    methods = {
+        "sql SELECT *": sql_select_star,
+        "sql 3 columns": sql_columns,
+        "doc store": lambda ids: store.get(engine.rows_of(ids)),
+    }
+    engine.rows_of(all_ids[:1])  # build the id -> row map before timing
+    print(f"document store: {len(store)} docs, {store.nbytes / 1024 / 1024:.1f} MB")
+    print(f"{'method':<15}{'bytes/lookup':>14}{'us/lookup':>11}{'rank order':>12}")
+    for name, fetch in methods.items():
+        fetch(lookups[0])  # warm up (connection, page cache)
+        start = time.perf_counter()
+        results = [fetch(ids) for ids in lookups]
+        elapsed = time.perf_counter() - start
+        in_order = all([d["id"] for d in docs] == ids for docs, ids in zip(results, lookups))
+        size = sum(payload_bytes(docs) for docs in results) / len(results)
+        print(f"{name:<15}{size:>14.0f}{1e6 * elapsed / len(lookups):>11.1f}{str(in_order):>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: dense vs BM25 vs hybrid (RRF) retrieval on the built data.
+
+Evaluation queries are generated from the corpus itself: the bare reference
+("ISO 27001") and a title fragment of sampled standards, whose own id is the
+expected hit. Requires iso_standards.db and the embeddings from
+prepare_data.py.
+
+    python benchmarks/bench_hybrid.py --queries 300 --top-k 5
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.db import get_connection
+from utils.embeddings import EmbeddingEngine
+from utils.retrieval import HybridRetriever
+
+
+def evaluation_queries(n, seed=0):
+    rows = get_connection().execute("SELECT id, title_en FROM standards").fetchall()
+    rng = random.Random(seed)
+    queries = []
+    for doc_id, title in rng.sample(rows, min(n, len(rows))):
+        queries.append(("reference", re.sub(r":\d{4}.*$", "", doc_id), doc_id))
+        words = (title or "").split()
+        if len(words) >= 4:
+            start = rng.randint(0, len(words) - 4)
+            queries.append(("title", " ".join(words[start:start + 4]), doc_id))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = EmbeddingEngine()
+    engine.model  # load before timing
+    retrievers = {
+        "dense": HybridRetriever(engine, {"dense": 1.0, "bm25": 0.0}),
+        "bm25": HybridRetriever(engine, {"dense": 0.0, "bm25": 1.0}),
+        "hybrid": HybridRetriever(engine),
+    }
+    queries = evaluation_queries(args.queries)
+
+    print(f"{'retriever':<10}{'kind':<11}{'recall@' + str(args.top_k):>10}{'ms/query':>10}")
+    for name, retriever in retrievers.items():
+        for kind in ("reference", "title"):
+            subset = [q for q in queries if q[0] == kind]
+            engine.cache.clear()
+            hits = 0
+            start = time.perf_counter()
+            for _, text, expected in subset:
+                hits += expected in retriever.search(text, top_k=args.top_k)
+            ms = (time.perf_counter() - start) * 1000 / max(len(subset), 1)
+            print(f"{name:<10}{kind:<11}{hits / max(len(subset), 1):>10.3f}{ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
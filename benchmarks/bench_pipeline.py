@@ -0,0 +1,75 @@
+"""
+Load test: the full pipeline (router, SQL, RAG, chart, synthesis) with
+concurrent users, with the LLM replaced by the offline fake backend of
+utils/llm.py. No network or API key needed; requires iso_standards.db, the
+vector index and the embedding model.
+
+Reports end-to-end latency percentiles, throughput, and the gateway's
+calls, retries and tokens per agent.
+
+    python benchmarks/bench_pipeline.py --users 8 --requests 64 --latency 0.8 --failure-rate 0.05
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+from agents.orchestrator import Orchestrator
+from agents.rag_agent import RAGAgent
+from agents.sql_agent import SQLAgent
+from agents.synthesis_agent import SynthesisAgent
+from agents.viz_agent import VizAgent
+from utils.llm import FakeBackend, LLMGateway
+from utils.router import EXAMPLES, QueryRouter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=8, help="concurrent users")
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=config.LLM_FAKE_LATENCY, help="seconds per LLM call")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of LLM calls rate limited")
+    parser.add_argument('--concurrency', type=int, default=config.LLM_MAX_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument('--no-router', action='store_true')
+    args = parser.parse_args()
+
+    llm = LLMGateway(FakeBackend(latency=args.latency, failure_rate=args.failure_rate, seed=0),
+                     max_concurrency=args.concurrency)
+    rag = RAGAgent(llm)
+    router = None if args.no_router else QueryRouter(rag.embedding_engine).fit()
+    orchestrator = Orchestrator(rag, SQLAgent(llm), VizAgent(), SynthesisAgent(llm), router=router)
+    questions = [q for qs in EXAMPLES.values() for q in qs]
+    questions = [questions[i % len(questions)] for i in range(args.requests)]
+
+    def ask(question):
+        start = time.perf_counter()
+        result = orchestrator.run(question)
+        return time.perf_counter() - start, bool(result["timed_out"] or result["errors"])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        results = list(pool.map(ask, questions))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([seconds for seconds, _ in results])
+    print(f"\n{args.requests} requests, {args.users} users, LLM {args.latency}s/call, "
+          f"{args.concurrency} calls in flight, router {'off' if args.no_router else 'on'}")
+    print(f"latency p50 {np.percentile(latencies, 50):.2f}s  p95 {np.percentile(latencies, 95):.2f}s  "
+          f"max {latencies.max():.2f}s")
+    print(f"throughput {args.requests / elapsed:.2f} requests/s, "
+          f"{sum(failed for _, failed in results)} partial answers")
+    print(f"\n{'agent':<11}{'calls':>7}{'retries':>9}{'errors':>8}{'prompt tok':>12}{'output tok':>12}{'avg s':>8}")
+    for purpose, entry in llm.stats().items():
+        print(f"{purpose:<11}{entry['calls']:>7}{entry['retries']:>9}{entry['errors']:>8}"
+              f"{entry['prompt_tokens']:>12}{entry['completion_tokens']:>12}{entry['avg_seconds']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: standards preparation with per-row `.apply` (former behaviour:
+regex compiled on every call, `any(...)` loop for the ICS priority) vs the
+vectorized prepare_data.select_standards, on a synthetic deliverables table.
+Both outputs are checked to be identical.
+
+    python benchmarks/bench_prepare.py --rows 200000
+"""
+
+import argparse
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import prepare_data
+from prepare_data import select_standards
+
+ICS_CODES = ['03.120.10', '35.040', '13.020.20', '03.100.70', '27.015', '01.040', '91.100', '43.040']
+
+
+def synthetic_deliverables(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n_rows)
+    years = rng.integers(1970, 2026, n_rows)
+    titles = [
+        f'{{en: "Part {i}: \\"quoted\\" requirements", fr: "Partie {i}: exigences"}}' for i in ids
+    ]
+    scopes = [f'{{en: "This document specifies {i} things for {i % 97} uses."}}' for i in ids]
+    ics = rng.choice(ICS_CODES, n_rows)
+    second = rng.choice(ICS_CODES, n_rows)
+    df = pd.DataFrame({
+        'reference': [f'ISO {i}:{y}' for i, y in zip(ids, years)],
+        'currentStage': rng.choice([6060, 9093, 6060, 6060], n_rows),
+        'title': titles,
+        'scope': scopes,
+        'icsCode': [f'{a}; {b}' if i % 3 == 0 else a for i, (a, b) in enumerate(zip(ics, second))],
+        'publicationDate': [f'{y}-0{1 + y % 9}-15' for y in years],
+        'ownerCommittee': [f'ISO/TC {c}' for c in rng.integers(1, 320, n_rows)],
+    })
+    # Some missing values, as in the real export
+    df.loc[rng.choice(n_rows, n_rows // 50, replace=False), 'scope'] = None
+    df.loc[rng.choice(n_rows, n_rows // 50, replace=False), 'icsCode'] = None
+    return df
+
+
+def rowwise_extract(text, lang='en'):
+    if pd.isna(text):
+        return ''
+    text = str(text)
+    pattern = f'{lang}:\\s*"((?:[^"\\\\]|\\\\.)*)"'
+    match = re.search(pattern, text)
+    if match:
+        return match.group(1).replace('\\"', '"')
+    return ''
+
+
+def rowwise_select(df, n):
+    """select_standards as it was before vectorization."""
+    df['stage_numeric'] = pd.to_numeric(df['currentStage'], errors='coerce')
+    df = df[
+        (df['stage_numeric'] == 6060) |
+        (df['stage_numeric'] == 60.60) |
+        (df['currentStage'].astype(str).str.contains('60.60'))
+    ].copy()
+    df['title_en'] = df['title'].apply(lambda x: rowwise_extract(x, 'en'))
+    df['title_fr'] = df['title'].apply(lambda x: rowwise_extract(x, 'fr'))
+    df['scope_text'] = df['scope'].apply(lambda x: rowwise_extract(x, 'en'))
+    df['title_en'] = df['title_en'].replace('nan', '').fillna('')
+    df['scope_text'] = df['scope_text'].replace('nan', '').fillna('')
+    df['full_text'] = (
+        df['reference'].fillna('') + ' ' +
+        df['title_en'].fillna('') + ' ' +
+        df['scope_text'].fillna('')
+    )
+    df = df[df['full_text'].str.len() > 10].copy()
+    df['year'] = pd.to_datetime(df['publicationDate'], errors='coerce').dt.year
+    df['recency_score'] = (df['year'].fillna(2000) - 1950) / (2026 - 1950)
+    priority_ics = ['03.120', '35.', '13.020', '03.100', '27.']
+    df['priority_score'] = df['icsCode'].apply(
+        lambda x: 1.0 if any(ics in str(x) for ics in priority_ics) else 0.5
+    )
+    df['final_score'] = df['recency_score'] * 0.6 + df['priority_score'] * 0.4
+    return df.nlargest(min(n, len(df)), 'final_score')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--n', type=int, default=30000, help='standards kept')
+    args = parser.parse_args()
+
+    prepare_data.logger.setLevel(logging.WARNING)
+    df = synthetic_deliverables(args.rows)
+    print(f"{args.rows} deliverables, keeping top {args.n}")
+
+    start = time.perf_counter()
+    expected = rowwise_select(df.copy(), args.n)
+    rowwise_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = select_standards(df.copy(), args.n)
+    vectorized_s = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(result, expected)
+    print(f"{'row-wise apply':<16}{rowwise_s:>8.2f}s")
+    print(f"{'vectorized':<16}{vectorized_s:>8.2f}s  ({rowwise_s / vectorized_s:.1f}x)")
+    print("outputs identical")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: float32 vs float16 vs int8 embedding storage, read from a
+vector_index.bin laid out as prepare_data.py writes it (utils/vector_index.py).
+
+Reports size per dtype, load time (copied into RAM vs memory-mapped view),
+query latency and recall@k against float32 exact search, with and without
+float32 rescoring.
+
+    python benchmarks/bench_quantization.py --rows 200000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_ann import synthetic_corpus
+from utils.ann_index import exact_search, recall_at_k, top_k_indices
+from utils.quantization import VectorStore, quantize_int8
+from utils.vector_index import STORAGE_ARRAYS, VectorIndexFile, write_vector_index
+
+
+def search(store, full, q, top_k, rescore_factor):
+    if not rescore_factor:
+        return exact_search(store, q, top_k)[0]
+    rows, _ = exact_search(store, q, top_k * rescore_factor)
+    rows = np.sort(rows)
+    best = top_k_indices(full[rows] @ q, top_k)
+    return rows[best]
+
+
+def open_store(path, dtype, mmap):
+    # Same arrays as EmbeddingEngine; eager load copies the codes into RAM
+    artifact = VectorIndexFile.open(path)
+    name, scales_name = STORAGE_ARRAYS[dtype]
+    data = artifact[name] if mmap else np.array(artifact[name])
+    scales = np.array(artifact[scales_name]) if scales_name else None
+    return VectorStore(data, scales)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--rescore-factor', type=int, default=4)
+    parser.add_argument('--index', default=None, help="vector_index.bin to take the vectors from")
+    args = parser.parse_args()
+
+    if args.index:
+        embeddings = np.array(VectorIndexFile.open(args.index)["vectors"])
+    else:
+        embeddings = synthetic_corpus(args.rows, args.dim)
+
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(len(embeddings), size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [exact_search(embeddings, q, args.top_k)[0] for q in queries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'vector_index.bin'
+        codes, scales = quantize_int8(embeddings)
+        write_vector_index(path, {
+            'vectors': embeddings,
+            'vectors_f16': embeddings.astype(np.float16),
+            'vectors_int8': codes,
+            'vectors_int8_scales': scales,
+        }, model='benchmark')
+        full = open_store(path, 'float32', mmap=True)
+
+        print(f"Corpus: {embeddings.shape}, file {path.stat().st_size / 1024 / 1024:.1f} MB")
+        print(f"{'dtype':<9}{'MB':>9}{'load ms':>9}{'mmap ms':>9}"
+              f"{'recall':>8}{'ms/q':>8}{'recall+rs':>11}{'ms/q+rs':>9}")
+        for dtype in STORAGE_ARRAYS:
+            start = time.perf_counter()
+            open_store(path, dtype, mmap=False)
+            load_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            store = open_store(path, dtype, mmap=True)
+            mmap_ms = (time.perf_counter() - start) * 1000
+
+            row = f"{dtype:<9}{store.nbytes / 1024 / 1024:>9.1f}{load_ms:>9.1f}{mmap_ms:>9.2f}"
+            for factor in (0, args.rescore_factor):
+                start = time.perf_counter()
+                found = [search(store, full, q, args.top_k, factor) for q in queries]
+                ms = (time.perf_counter() - start) * 1000 / len(queries)
+                recall = np.mean([recall_at_k(f, t) for f, t in zip(found, truth)])
+                row += f"{recall:>8.3f}{ms:>8.2f}" if not factor else f"{recall:>11.3f}{ms:>9.2f}"
+            print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: query router accuracy and the agent work it avoids, on held-out
+questions (not among the router's examples). Requires the embedding model.
+
+Reports accuracy per route, "unsafe" errors (a needed agent was skipped, as
+opposed to running an agent for nothing), routing latency with the query
+embedding already cached (as in the app, where the answer cache encodes the
+question first) and including the encoding, and the share of SQL / RAG
+stages skipped. Time saved uses the average stage durations passed on the
+command line (read them from the "Stage timings" lines the app prints).
+
+    python benchmarks/bench_router.py --sql-seconds 1.5 --rag-seconds 2.0 --viz-seconds 0.1
+
+ROUTER_MIN_MARGIN is tuned here (--margin): keep the smallest margin with
+no unsafe errors, and disable the router (config.ROUTER_ENABLED) if none
+has any. Results for the shipped margin are in README.md.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.embeddings import EmbeddingEngine
+from utils.router import AGENT_STAGES, ROUTES, QueryRouter
+
+HELD_OUT = {
+    "rag": [
+        "What is ISO 22000?",
+        "Explain the purpose of ISO 13485",
+        "Which standards describe good practices for software testing?",
+        "Find a standard for greenhouse gas accounting",
+        "What does ISO 26000 say about social responsibility?",
+        "Standards about accessibility of buildings",
+        "Which standard specifies country codes?",
+        "Describe ISO 19011 audit guidelines",
+        "Is there a standard for business continuity?",
+        "What are the requirements of ISO 37001 anti-bribery?",
+    ],
+    "sql": [
+        "How many standards were published in 2019?",
+        "Which committee owns the most standards in ICS 13?",
+        "Count standards published since 2021",
+        "List the five most productive committees",
+        "How many standards belong to ICS group 91?",
+        "What is the most recent standard of TC 176?",
+        "Number of standards owned by JTC 1",
+        "Which ICS groups have fewer than 10 standards?",
+        "How many standards were published before 1990?",
+        "Total number of committees with at least one standard",
+    ],
+    "viz": [
+        "Plot the yearly number of publications",
+        "Show a chart of standards per ICS group",
+        "Visualize the publication trend of TC 207",
+        "Bar chart of the top committees",
+        "Graph the evolution of standards since 2010",
+        "Show the distribution of publication years",
+        "Chart how many standards each ICS group had per year",
+        "Display publications per committee as a chart",
+        "Timeline of JTC 1/SC 42 standards",
+        "Show the trend of publications over the past 20 years",
+    ],
+    "all": [
+        "How many quantum computing standards exist and what do they cover?",
+        "Analyze the evolution of cybersecurity standards and name the key ones",
+        "Which committees handle renewable energy and what are their main standards?",
+        "Give me statistics and an overview of standards on packaging",
+        "How did biotechnology standards evolve and which ones are essential?",
+        "State of standardization for autonomous vehicles",
+        "Give me an analysis of healthcare informatics standards with numbers",
+        "What are the main additive manufacturing standards and how many were published per year?",
+        "Overview of circular economy standards, counts and key documents",
+        "Summarize the activity of TC 204 with figures and main standards",
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sql-seconds', type=float, default=1.5, help="average SQL stage duration")
+    parser.add_argument('--rag-seconds', type=float, default=2.0, help="average RAG stage duration")
+    parser.add_argument('--viz-seconds', type=float, default=0.1, help="average chart duration")
+    parser.add_argument('--margin', type=float, default=None, help="override ROUTER_MIN_MARGIN")
+    args = parser.parse_args()
+
+    engine = EmbeddingEngine()
+    router = QueryRouter(engine, min_margin=args.margin)
+    start = time.perf_counter()
+    router.fit()
+    print(f"fit: {sum(map(len, router.examples.values()))} examples in {time.perf_counter() - start:.2f}s")
+
+    questions = [(q, label) for label, qs in HELD_OUT.items() for q in qs]
+    engine.cache.clear()
+    start = time.perf_counter()
+    predicted = [router.classify(q)[0] for q, _ in questions]
+    cold_ms = 1000 * (time.perf_counter() - start) / len(questions)
+    start = time.perf_counter()
+    for q, _ in questions:
+        router.classify(q)
+    cached_ms = 1000 * (time.perf_counter() - start) / len(questions)
+
+    print(f"\n{'route':<6}{'questions':>10}{'accuracy':>10}{'unsafe':>8}")
+    for label in HELD_OUT:
+        pairs = [(p, t) for p, (_, t) in zip(predicted, questions) if t == label]
+        correct = sum(p == t for p, t in pairs)
+        unsafe = sum(not set(ROUTES[t]) <= set(ROUTES[p]) for p, t in pairs)
+        print(f"{label:<6}{len(pairs):>10}{correct / len(pairs):>10.0%}{unsafe:>8}")
+    accuracy = sum(p == t for p, (_, t) in zip(predicted, questions)) / len(questions)
+    unsafe = sum(not set(ROUTES[t]) <= set(ROUTES[p]) for p, (_, t) in zip(predicted, questions))
+    print(f"{'total':<6}{len(questions):>10}{accuracy:>10.0%}{unsafe:>8}")
+    for q, p, t in [(q, p, t) for p, (q, t) in zip(predicted, questions) if p != t]:
+        print(f"  {t} -> {p}: {q}")
+
+    skipped = {stage: sum(stage not in ROUTES[p] for p in predicted) for stage in AGENT_STAGES}
+    saved = skipped["sql"] * args.sql_seconds + skipped["rag"] * args.rag_seconds + skipped["viz"] * args.viz_seconds
+    print(f"\nrouting: {cached_ms:.2f} ms/question with the query embedding cached, "
+          f"{cold_ms:.2f} ms including encoding")
+    print(f"skipped: SQL {skipped['sql'] / len(questions):.0%}, RAG {skipped['rag'] / len(questions):.0%}, "
+          f"charts {skipped['viz'] / len(questions):.0%} of questions")
+    print(f"agent time saved: {saved / len(questions):.2f}s per question on average "
+          f"(SQL {args.sql_seconds}s, RAG {args.rag_seconds}s, chart {args.viz_seconds}s per stage)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: SQL template matching. Checks that analytics questions map to
+the expected template and that questions a template would answer wrongly
+(one standard or committee, extra topic words, unknown numbers, a breakdown
+the template lacks) fall back
+to the LLM, then times the matcher.
+
+    python benchmarks/bench_sql_templates.py --repeat 2000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.sql_templates import match_template
+
+# Question -> expected template name (None = left to the LLM)
+CASES = {
+    "Show the evolution of standards per year": "count_per_year",
+    "How many standards were published since 2015?": "count_in_range",
+    "Number of standards between 2010 and 2020": "count_in_range",
+    "Top 5 committees": "top_committees",
+    "Which are the most active committees since 2020?": "top_committees",
+    "Distribution of standards per ICS group": "count_per_ics",
+    "Yearly trend of standards from 2000 to 2020": "count_per_year",
+    # A single standard or committee, not the whole corpus
+    "Show the yearly trend of ISO 27001 standards": None,
+    "Evolution of ISO 9001 by year": None,
+    "Standards per year for TC 307": None,
+    "How many standards does ISO/IEC JTC 1/SC 27 have since 2020?": None,
+    # Topic words and numbers the templates would ignore
+    "Evolution of AI standards per year": None,
+    "How many standards with 3 parts were published since 2015?": None,
+    # Breakdowns the matching template doesn't produce
+    "Show the most active committees by year": None,
+    "Top 5 committees per ICS field": None,
+    "Evolution of standards per year by ICS group": None,
+    "How many standards per committee since 2015?": None,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = 0
+    for question, expected in CASES.items():
+        match = match_template(question)
+        got = match.name if match else None
+        ok = got == expected
+        failures += not ok
+        print(f"{'ok ' if ok else 'BAD'} {str(got):<16} {question}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for question in CASES:
+            match_template(question)
+    elapsed = time.perf_counter() - start
+    print(f"\n{1e6 * elapsed / (args.repeat * len(CASES)):.1f} us per question")
+    if failures:
+        sys.exit(f"{failures} unexpected matches")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: per-query overhead of a fresh sqlite3 connection per call (former
+behaviour) vs the per-thread read-only connections from utils.db, under
+concurrent load.
+
+    python benchmarks/bench_sqlite.py --rows 30000 --threads 8
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.db import get_connection
+
+
+def build_db(path, n_rows):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE standards (id TEXT, title_en TEXT, abstract TEXT, "
+        "ownerCommittee TEXT, year INTEGER, full_text TEXT)"
+    )
+    rng = random.Random(0)
+    conn.executemany(
+        "INSERT INTO standards VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (f"ISO {i}:{2000 + i % 25}", f"Title {i}", "Scope " * 40,
+             f"ISO/TC {rng.randint(1, 300)}", 1980 + i % 45, "Text " * 80)
+            for i in range(n_rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def fresh_connection_lookup(path, ids):
+    conn = sqlite3.connect(path)
+    placeholders = ','.join('?' * len(ids))
+    conn.execute(f"SELECT * FROM standards WHERE id IN ({placeholders})", ids).fetchall()
+    conn.execute("SELECT count(*) FROM standards").fetchone()
+    conn.close()
+
+
+def pooled_lookup(path, ids):
+    conn = get_connection(path)
+    placeholders = ','.join('?' * len(ids))
+    conn.execute(f"SELECT * FROM standards WHERE id IN ({placeholders})", ids).fetchall()
+    conn.execute("SELECT count(*) FROM standards").fetchone()
+
+
+def run(fn, path, n_rows, n_queries, n_threads):
+    rng = random.Random(1)
+    batches = [
+        [f"ISO {i}:{2000 + i % 25}" for i in rng.sample(range(n_rows), 5)]
+        for _ in range(n_queries)
+    ]
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda ids: fn(path, ids), batches))
+        elapsed = time.perf_counter() - start
+    return elapsed * 1000 / n_queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=30000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'bench.db')
+        build_db(path, args.rows)
+        print(f"{'threads':<9}{'fresh ms/q':>12}{'pooled ms/q':>13}")
+        for n_threads in sorted({1, args.threads}):
+            fresh = run(fresh_connection_lookup, path, args.rows, args.queries, n_threads)
+            pooled = run(pooled_lookup, path, args.rows, args.queries, n_threads)
+            print(f"{n_threads:<9}{fresh:>12.3f}{pooled:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,8 @@ from pathlib import Path
 # Paths
 BASE_DIR = Path(__file__).parent.absolute()
 DB_PATH = str(BASE_DIR / "iso_standards.db")
-EMBEDDINGS_PATH = str(BASE_DIR / "embeddings.npy")
-EMBEDDINGS_IDS_PATH = str(BASE_DIR / "embeddings_ids.csv")
+# Vectors (float32 + float16/int8 copies), ids, IVF index and build metadata
+VECTOR_INDEX_PATH = str(BASE_DIR / "vector_index.bin")
 
 # App settings
 COLLECTION_NAME = "iso_standards"
@@ -15,3 +15,110 @@ DOMAIN = "international standardization"
 # Model settings (using Groq as per spec, though user key must be provided)
 # Ensure you have GROQ_API_KEY in your environment variables.
 GROQ_MODEL = "qwen/qwen3-32b" 
+
+# SQLite read connections (one per thread, opened read-only)
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the DB file mapped into memory
+SQLITE_CACHE_SIZE = 64 * 1024 * 1024  # page cache per connection, in bytes
+SQLITE_CACHED_STATEMENTS = 256
+
+# Vector search settings
+# Number of IVF lists scanned per query: higher = better recall, slower search.
+# Exact search is used when no index exists or ANN_NPROBE covers every list.
+ANN_NPROBE = 8
+# Number of IVF lists built by prepare_data.py (None = sqrt of corpus size)
+ANN_N_LISTS = None
+
+# Sentence embedding model; the vector index refuses to load if built with another
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Embedding generation in prepare_data.py
+EMBEDDING_WORKERS = None  # encoding processes (None = one per CPU core)
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_CHECKPOINT_ROWS = 2048  # rows encoded between two checkpoints
+
+# Embedding storage used for scoring: "float32", "float16" or "int8"
+EMBEDDINGS_DTYPE = "float32"
+# Memory-map embedding files so app workers share pages via the OS cache
+EMBEDDINGS_MMAP = True
+# With a compact dtype, rescore top_k * factor candidates in float32 (0 = off)
+EMBEDDINGS_RESCORE_FACTOR = 4
+
+# Metadata-filtered search (year range, committee, ICS prefix): when at most
+# this many rows match, they are scanned exactly instead of through the index
+FILTER_EXACT_MAX_ROWS = 5000
+RECENT_YEARS = 3  # "recent" in a question means published in the last N years
+
+# Hybrid retrieval: reciprocal-rank fusion of dense and BM25 (FTS5) rankings.
+# A weight of 0 disables a signal (dense = 0 skips the query encode).
+RETRIEVAL_WEIGHTS = {"dense": 1.0, "bm25": 1.0}
+RETRIEVAL_CANDIDATES = 50  # ids taken from each signal before fusion
+RRF_K = 60
+BM25_TITLE_WEIGHT = 2.0  # relative to full_text
+
+# Queries encoded and scored together by EmbeddingEngine.search_many
+SEARCH_BATCH_SIZE = 64
+
+# Query cache (query embedding + top-k ids), keyed on normalized query text
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 3600  # seconds
+
+# Answer common analytics questions (top committees, counts per year / ICS
+# group / date range) from local SQL templates instead of an LLM call
+SQL_TEMPLATES_ENABLED = True
+
+# Guarded execution of generated SQL
+SQL_TIMEOUT = 5  # seconds of wall-clock time per query
+SQL_MAX_ROWS = 1000  # rows kept; the result is flagged as truncated beyond
+SQL_FETCH_CHUNK = 256  # rows fetched per fetchmany() call
+SQL_PROGRESS_STEPS = 10000  # SQLite VM steps between deadline checks
+SQL_MAX_CELL_CHARS = 500  # longer text cells are cut
+
+# Prompt size: tokens are estimated locally (utils/token_budget.py) and each
+# section of a prompt template is cut or summarized to its budget
+PROMPT_BUDGETS = {
+    "sql": {"query": 300},
+    "rag": {"query": 300, "context": 2000},
+    "synthesis": {"query": 300, "rag_results": 1500, "sql_results": 1500, "viz_description": 50},
+}
+SQL_SUMMARY_ROWS = 10  # first / last rows kept when a SQL result exceeds its budget
+
+# Result cache for generated SQL (canonicalized query -> Arrow-compressed result)
+SQL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SQL_CACHE_MAX_ENTRIES = 512
+SQL_CACHE_TTL = None  # seconds; the cache is also cleared when the DB file changes
+
+# Semantic answer cache: reuse the full answer of a previous question whose
+# embedding cosine similarity is at least the threshold
+ANSWER_CACHE_THRESHOLD = 0.92
+ANSWER_CACHE_SIZE = 500
+ANSWER_CACHE_TTL = 24 * 3600  # seconds
+
+# Startup: import and initialize agents in a background thread so the UI is
+# interactive immediately (False = load everything before the first render)
+LAZY_STARTUP = True
+
+# LLM gateway (utils/llm.py): one client shared by every agent
+LLM_BACKEND = "groq"  # "fake": offline stand-in with simulated latency, for load tests
+LLM_TIMEOUT = 20  # seconds per call
+LLM_MAX_CONCURRENCY = 8  # calls in flight, also the HTTP connection pool size
+LLM_MAX_RETRIES = 3  # timeouts, connection / server errors and rate limits
+LLM_BACKOFF_BASE = 0.5  # seconds, doubled per attempt, full jitter
+LLM_BACKOFF_MAX = 8
+LLM_DEADLINE_MARGIN = 0.5  # seconds: calls give up this long before their caller's deadline
+LLM_FAKE_LATENCY = 0.8  # seconds per call of the fake backend
+LLM_FAKE_JITTER = 0.3
+LLM_FAKE_TOKENS_PER_SECOND = 200
+LLM_FAKE_FAILURE_RATE = 0.0  # share of fake calls answered with a rate limit
+
+# Query router: run only the agents a question needs (see utils/router.py).
+# Questions whose two closest routes are within the margin run every agent.
+# 0.08: smallest margin (+0.01) with no needed agent skipped on the held-out
+# questions of benchmarks/bench_router.py (results in README.md)
+ROUTER_ENABLED = True
+ROUTER_MIN_MARGIN = 0.08
+
+# Orchestrator: per-stage deadlines (seconds) and worker threads
+STAGE_TIMEOUTS = {"sql": 30, "rag": 30, "synthesis": 60}
+ORCHESTRATOR_WORKERS = 8
+# Stream the synthesis answer token by token instead of waiting for completion
+STREAM_SYNTHESIS = True
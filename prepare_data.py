@@ -8,11 +8,26 @@ import requests
 from pathlib import Path
 import sqlite3
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from sentence_transformers import SentenceTransformer
 import logging
 import sys
+import os
+import time
 import json
 import ast
+import re
+import argparse
+import hashlib
+import functools
+import config
+from utils.ann_index import IVFIndex, exact_search, recall_at_k
+from utils.quantization import quantize_int8
+from utils.vector_index import VectorIndexFile, VectorIndexError, write_vector_index, encode_ids, decode_ids
+from utils.metadata_filter import build_filter_arrays
+from utils.doc_store import document_arrays
+from utils.ingest import ingest_csv
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,7 +56,12 @@ ISO_OPEN_DATA_URLS = {
 # =============================================================================
 
 def download_iso_data():
-    """Télécharge les datasets ISO Open Data (format CSV)"""
+    """
+    Télécharge les datasets ISO Open Data (CSV) en streaming et les convertit
+    en Parquet par blocs. Requêtes conditionnelles (ETag / Last-Modified):
+    un dataset inchangé n'est ni re-téléchargé ni reconverti, et un
+    téléchargement interrompu reprend là où il s'est arrêté.
+    """
     
     Path('data').mkdir(exist_ok=True)
     
@@ -57,50 +77,38 @@ def download_iso_data():
     
     success = True
     
-    # Téléchargement des datasets essentiels
-    for name, url in essential_datasets.items():
-        try:
-            logger.info(f"Downloading {name} from ISO Open Data...")
-            
-            response = requests.get(url, timeout=60)
-            response.raise_for_status()
-            
-            csv_path = f'data/{name}.csv'
-            with open(csv_path, 'wb') as f:
-                f.write(response.content)
-            
-            # Lecture avec gestion d'erreurs
-            df = pd.read_csv(csv_path, encoding='utf-8', low_memory=False)
-            
-            parquet_path = f'data/{name}.parquet'
-            df.to_parquet(parquet_path)
-            
-            logger.info(f"✓ {name}: {len(df)} rows downloaded and converted to Parquet")
-            
-        except Exception as e:
-            logger.error(f"✗ Failed to download {name}: {e}")
-            success = False
-    
-    # Téléchargement des datasets optionnels (non bloquant)
-    for name, url in optional_datasets.items():
-        try:
-            logger.info(f"Downloading {name} (optional)...")
-            response = requests.get(url, timeout=60)
-            response.raise_for_status()
-            
-            csv_path = f'data/{name}.csv'
-            with open(csv_path, 'wb') as f:
-                f.write(response.content)
-            
-            # ICS a des problèmes de format, on essaie avec error_bad_lines
-            df = pd.read_csv(csv_path, encoding='utf-8', on_bad_lines='skip')
-            df.to_parquet(f'data/{name}.parquet')
-            
-            logger.info(f"✓ {name}: {len(df)} rows (optional)")
-            
-        except Exception as e:
-            logger.warning(f"⚠ Could not download {name} (optional): {e}")
-            # Pas bloquant, on continue
+    with requests.Session() as session:
+        # Téléchargement des datasets essentiels
+        for name, url in essential_datasets.items():
+            try:
+                logger.info(f"Downloading {name} from ISO Open Data...")
+                _, n_rows = ingest_csv(url, f'data/{name}.csv', f'data/{name}.parquet', session=session)
+                if n_rows is None:
+                    logger.info(f"✓ {name}: unchanged, keeping data/{name}.parquet")
+                else:
+                    logger.info(f"✓ {name}: {n_rows} rows downloaded and converted to Parquet")
+                
+            except Exception as e:
+                logger.error(f"✗ Failed to download {name}: {e}")
+                success = False
+        
+        # Téléchargement des datasets optionnels (non bloquant)
+        for name, url in optional_datasets.items():
+            try:
+                logger.info(f"Downloading {name} (optional)...")
+                # ICS a des problèmes de format: les lignes invalides sont ignorées
+                _, n_rows = ingest_csv(
+                    url, f'data/{name}.csv', f'data/{name}.parquet',
+                    skip_bad_lines=True, session=session
+                )
+                if n_rows is None:
+                    logger.info(f"✓ {name}: unchanged (optional)")
+                else:
+                    logger.info(f"✓ {name}: {n_rows} rows (optional)")
+                
+            except Exception as e:
+                logger.warning(f"⚠ Could not download {name} (optional): {e}")
+                # Pas bloquant, on continue
     
     return success
 
@@ -117,17 +125,28 @@ def extract_iso_map_regex(text, lang='en'):
         return ''
     text = str(text)
     
-    # Pattern to find lang key followed by quoted string
-    # Try with specific lang key first
-    # Matches: en: "Content here"
-    pattern = f'{lang}:\\s*"((?:[^"\\\\]|\\\\.)*)"'
-    match = re.search(pattern, text)
+    match = iso_map_pattern(lang).search(text)
     if match:
         return match.group(1).replace('\\"', '"')
     
     # Fallback: simple finding if keys are quoted or logic differs
     return ''
 
+@functools.lru_cache(maxsize=None)
+def iso_map_pattern(lang):
+    """Regex compilée (une fois par langue) d'une valeur du format ISO map"""
+    # Pattern to find lang key followed by quoted string
+    # Matches: en: "Content here"
+    # (syntaxe commune à re et RE2, utilisé par Arrow)
+    return re.compile(f'{lang}:\\s*"(?P<value>(?:[^"\\\\]|\\\\.)*)"')
+
+def extract_iso_map_column(series, lang='en'):
+    """Version vectorisée de extract_iso_map_regex sur une colonne entière (Arrow)"""
+    values = pa.array(series.fillna('').astype(str), type=pa.string())
+    matches = pc.extract_regex(values, iso_map_pattern(lang).pattern)
+    extracted = pc.replace_substring(pc.struct_field(matches, 'value'), '\\"', '"')
+    return extracted.fill_null('').to_pandas().set_axis(series.index)
+
 def prepare_standards_data(n=30000):
     """
     Prépare les données des standards ISO pour le RAG
@@ -138,6 +157,13 @@ def prepare_standards_data(n=30000):
     
     logger.info(f"Total deliverables: {len(df)}")
     
+    return select_standards(df, n)
+
+def select_standards(df, n=30000):
+    """
+    Filtre, extrait titres et scope, calcule les scores et garde les n
+    meilleurs standards. Opérations vectorisées sur les colonnes.
+    """
     # DEBUG: Print column names and sample stage
     logger.info(f"Columns: {df.columns.tolist()}")
     if 'currentStage' in df.columns:
@@ -176,7 +202,7 @@ def prepare_standards_data(n=30000):
         df['title_en'] = df['title.en'].astype(str)
     elif 'title' in df.columns:
         logger.info("Parsing 'title' column with Regex...")
-        df['title_en'] = df['title'].apply(lambda x: extract_iso_map_regex(x, 'en'))
+        df['title_en'] = extract_iso_map_column(df['title'], 'en')
     else:
         logger.warning("No 'title' or 'title.en' column found! Using empty strings.")
         df['title_en'] = ''
@@ -185,7 +211,7 @@ def prepare_standards_data(n=30000):
     if 'title.fr' in df.columns:
         df['title_fr'] = df['title.fr'].astype(str)
     elif 'title' in df.columns:
-        df['title_fr'] = df['title'].apply(lambda x: extract_iso_map_regex(x, 'fr'))
+        df['title_fr'] = extract_iso_map_column(df['title'], 'fr')
     else:
         df['title_fr'] = ''
 
@@ -193,7 +219,7 @@ def prepare_standards_data(n=30000):
     if 'scope.en' in df.columns:
         df['scope_text'] = df['scope.en'].astype(str)
     elif 'scope' in df.columns:
-        df['scope_text'] = df['scope'].apply(lambda x: extract_iso_map_regex(x, 'en'))
+        df['scope_text'] = extract_iso_map_column(df['scope'], 'en')
     else:
         df['scope_text'] = ''
     
@@ -218,9 +244,8 @@ def prepare_standards_data(n=30000):
     
     # Priorité: Standards de management et IT
     priority_ics = ['03.120', '35.', '13.020', '03.100', '27.']
-    df['priority_score'] = df['icsCode'].apply(
-        lambda x: 1.0 if any(ics in str(x) for ics in priority_ics) else 0.5
-    )
+    is_priority = df['icsCode'].astype(str).str.contains('|'.join(map(re.escape, priority_ics)))
+    df['priority_score'] = np.where(is_priority, 1.0, 0.5)
     
     # Score final
     df['final_score'] = df['recency_score'] * 0.6 + df['priority_score'] * 0.4
@@ -240,13 +265,125 @@ def prepare_standards_data(n=30000):
 # 3. CRÉATION DE LA BASE SQLite
 # =============================================================================
 
-def create_sqlite_db(df_standards):
-    """Crée la base SQLite optimisée pour l'application RAG"""
-    
-    logger.info("Creating SQLite database...")
-    
-    conn = sqlite3.connect('iso_standards.db')
-    
+# Schéma déclaré: clé primaire sur id + index pour les filtres/agrégations
+# fréquents (lookups RAG, GROUP BY year / ownerCommittee, filtres ICS)
+STANDARDS_SCHEMA = """
+CREATE TABLE standards (
+    id TEXT PRIMARY KEY,
+    reference TEXT,
+    title_en TEXT,
+    title_fr TEXT,
+    abstract TEXT,
+    publicationDate TEXT,
+    edition INTEGER,
+    icsCode TEXT COLLATE NOCASE,
+    ownerCommittee TEXT,
+    full_text TEXT,
+    status TEXT,
+    year INTEGER
+);
+CREATE INDEX idx_standards_year ON standards(year);
+CREATE INDEX idx_standards_committee ON standards(ownerCommittee, year);
+CREATE INDEX idx_standards_ics ON standards(icsCode);
+
+-- Une ligne par code ICS d'un standard (icsCode peut en contenir plusieurs)
+CREATE TABLE standard_ics (
+    standard_id TEXT NOT NULL REFERENCES standards(id),
+    ics_code TEXT NOT NULL,
+    ics_group TEXT NOT NULL,
+    PRIMARY KEY (ics_code, standard_id)
+) WITHOUT ROWID;
+CREATE INDEX idx_standard_ics_standard ON standard_ics(standard_id);
+CREATE INDEX idx_standard_ics_group ON standard_ics(ics_group);
+"""
+
+# Index plein texte (BM25) sur les titres et full_text, adossé à la table standards
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE standards_fts USING fts5(
+    id UNINDEXED, title_en, full_text,
+    content='standards', content_rowid='rowid'
+);
+INSERT INTO standards_fts(standards_fts) VALUES('rebuild');
+INSERT INTO standards_fts(standards_fts) VALUES('optimize');
+"""
+
+# Tables agrégées pré-calculées pour les questions analytiques (graphiques)
+AGGREGATE_TABLES = {
+    'agg_year': """
+        SELECT year, COUNT(*) AS count FROM standards
+        WHERE year IS NOT NULL GROUP BY year
+    """,
+    'agg_committee': """
+        SELECT ownerCommittee, COUNT(*) AS count FROM standards
+        WHERE ownerCommittee IS NOT NULL GROUP BY ownerCommittee
+    """,
+    'agg_committee_year': """
+        SELECT ownerCommittee, year, COUNT(*) AS count FROM standards
+        WHERE ownerCommittee IS NOT NULL AND year IS NOT NULL
+        GROUP BY ownerCommittee, year
+    """,
+    'agg_ics_group': """
+        SELECT ics_group, COUNT(DISTINCT standard_id) AS count FROM standard_ics
+        GROUP BY ics_group
+    """,
+    'agg_ics_group_year': """
+        SELECT i.ics_group, s.year, COUNT(DISTINCT i.standard_id) AS count
+        FROM standard_ics i JOIN standards s ON s.id = i.standard_id
+        WHERE s.year IS NOT NULL GROUP BY i.ics_group, s.year
+    """,
+}
+
+AGGREGATE_INDEXES = """
+CREATE UNIQUE INDEX idx_agg_year ON agg_year(year);
+CREATE UNIQUE INDEX idx_agg_committee ON agg_committee(ownerCommittee);
+CREATE UNIQUE INDEX idx_agg_committee_year ON agg_committee_year(ownerCommittee, year);
+CREATE INDEX idx_agg_committee_year_year ON agg_committee_year(year);
+CREATE UNIQUE INDEX idx_agg_ics_group ON agg_ics_group(ics_group);
+CREATE UNIQUE INDEX idx_agg_ics_group_year ON agg_ics_group_year(ics_group, year);
+"""
+
+ICS_CODE_PATTERN = re.compile(r'\b\d{2}(?:\.\d{3}(?:\.\d{2})?)?\b')
+
+# Requêtes représentatives (lookups RAG et analytics générées par le LLM)
+REPRESENTATIVE_QUERIES = {
+    'RAG lookup by id': "SELECT * FROM standards WHERE id IN ('a', 'b', 'c')",
+    'Count per year': "SELECT year, COUNT(*) AS count FROM standards GROUP BY year ORDER BY year",
+    'Top committees': "SELECT ownerCommittee, COUNT(*) AS count FROM standards GROUP BY ownerCommittee ORDER BY count DESC LIMIT 5",
+    'Committee by year': "SELECT year, COUNT(*) FROM standards WHERE ownerCommittee = 'ISO/TC 307' GROUP BY year",
+    'ICS prefix filter': "SELECT id, title_en FROM standards WHERE icsCode LIKE '35.%'",
+    'Count per ICS group': "SELECT ics_group, COUNT(DISTINCT standard_id) FROM standard_ics GROUP BY ics_group",
+    'Top committees (aggregate)': "SELECT ownerCommittee, count FROM agg_committee ORDER BY count DESC LIMIT 5",
+    'Committee by year (aggregate)': "SELECT year, count FROM agg_committee_year WHERE ownerCommittee = 'ISO/TC 307'",
+}
+
+def build_ics_mapping(df_export):
+    """Table normalisée (standard_id, ics_code, ics_group) à partir de icsCode"""
+    codes = df_export['icsCode'].fillna('').astype(str).str.findall(ICS_CODE_PATTERN)
+    mapping = pd.DataFrame({'standard_id': df_export['id'], 'ics_code': codes}).explode('ics_code')
+    mapping = mapping.dropna(subset=['ics_code']).drop_duplicates()
+    mapping['ics_group'] = mapping['ics_code'].str[:2]
+    return mapping
+
+def create_aggregate_tables(conn):
+    """Matérialise les agrégats par année / comité / groupe ICS"""
+    for name, query in AGGREGATE_TABLES.items():
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.execute(f"CREATE TABLE {name} AS {query}")
+        n_rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        logger.info(f"✓ Aggregate table {name}: {n_rows} rows")
+    conn.executescript(AGGREGATE_INDEXES)
+
+def report_query_plans(conn):
+    """Log le plan d'exécution des requêtes représentatives"""
+    logger.info("Query plans for representative queries:")
+    for name, sql in REPRESENTATIVE_QUERIES.items():
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        logger.info(f"  {name}:")
+        for row in plan:
+            logger.info(f"    {row[-1]}")
+
+def export_standards(df_standards):
+    """Prépare les lignes de la table standards; retourne (df_export, colonnes)"""
     # On renomme et prépare les colonnes pour l'app
     df_export = df_standards.copy()
     
@@ -265,40 +402,83 @@ def create_sqlite_db(df_standards):
     # Intersection avec colonnes existantes
     final_cols = [c for c in cols if c in df_export.columns]
     
-    df_export[final_cols].to_sql('standards', conn, if_exists='replace', index=False)
+    # Clé primaire: on élimine les doublons éventuels de référence
+    n_before = len(df_export)
+    df_export = df_export.drop_duplicates(subset='id')
+    if len(df_export) < n_before:
+        logger.warning(f"Dropped {n_before - len(df_export)} duplicate ids")
+    if 'year' in df_export.columns:
+        df_export['year'] = df_export['year'].astype('Int64')
+    
+    return df_export, final_cols
+
+def create_committees_table(conn):
+    """Table committees (remplacée à chaque exécution, si disponible)"""
+    committees_path = 'data/committees.parquet'
+    if not Path(committees_path).exists():
+        return
+    try:
+        df_committees = pd.read_parquet(committees_path)
+        logger.info(f"Committees columns: {df_committees.columns.tolist()}")
+        
+        # --- Processing Committees ---
+        # 1. Extract Title
+        if 'title.en' in df_committees.columns:
+            df_committees['title_en'] = df_committees['title.en'].astype(str)
+        elif 'title' in df_committees.columns:
+            df_committees['title_en'] = extract_iso_map_column(df_committees['title'], 'en')
+        else:
+            df_committees['title_en'] = ''
+        
+        # 2. Extract ID (reference -> id)
+        if 'reference' in df_committees.columns:
+            df_committees['id'] = df_committees['reference']
+        
+        # Select simple columns for SQL
+        # We want: id, title_en, scope (optional)
+        comm_cols = ['id', 'reference', 'title_en']
+        final_comm_cols = [c for c in comm_cols if c in df_committees.columns]
+        
+        df_committees[final_comm_cols].to_sql('committees', conn, if_exists='replace', index=False)
+        logger.info(f"✓ Committees table: {len(df_committees)} rows")
+        
+    except Exception as e:
+        logger.warning(f"Could not load committees: {e}")
+
+def create_sqlite_db(df_standards):
+    """Crée la base SQLite optimisée pour l'application RAG"""
+    
+    logger.info("Creating SQLite database...")
+    
+    df_export, final_cols = export_standards(df_standards)
+    
+    conn = sqlite3.connect('iso_standards.db')
+    
+    conn.executescript("""
+        DROP TABLE IF EXISTS standards_fts;
+        DROP TABLE IF EXISTS standard_ics;
+        DROP TABLE IF EXISTS standards;
+    """)
+    conn.executescript(STANDARDS_SCHEMA)
+    df_export[final_cols].to_sql('standards', conn, if_exists='append', index=False)
     
     logger.info(f"✓ Standards table: {len(df_export)} rows")
     
-    # Table committees (si disponible)
-    committees_path = 'data/committees.parquet'
-    if Path(committees_path).exists():
-        try:
-            df_committees = pd.read_parquet(committees_path)
-            logger.info(f"Committees columns: {df_committees.columns.tolist()}")
-            
-            # --- Processing Committees ---
-            # 1. Extract Title
-            if 'title.en' in df_committees.columns:
-                df_committees['title_en'] = df_committees['title.en'].astype(str)
-            elif 'title' in df_committees.columns:
-                df_committees['title_en'] = df_committees['title'].apply(lambda x: extract_iso_map_regex(x, 'en'))
-            else:
-                df_committees['title_en'] = ''
-            
-            # 2. Extract ID (reference -> id)
-            if 'reference' in df_committees.columns:
-                df_committees['id'] = df_committees['reference']
-            
-            # Select simple columns for SQL
-            # We want: id, title_en, scope (optional)
-            comm_cols = ['id', 'reference', 'title_en']
-            final_comm_cols = [c for c in comm_cols if c in df_committees.columns]
-            
-            df_committees[final_comm_cols].to_sql('committees', conn, if_exists='replace', index=False)
-            logger.info(f"✓ Committees table: {len(df_committees)} rows")
-            
-        except Exception as e:
-            logger.warning(f"Could not load committees: {e}")
+    conn.executescript(FTS_SCHEMA)
+    logger.info("✓ Full-text index (FTS5) built")
+    
+    if 'icsCode' in df_export.columns:
+        df_ics = build_ics_mapping(df_export)
+        df_ics.to_sql('standard_ics', conn, if_exists='append', index=False)
+        logger.info(f"✓ ICS mapping table: {len(df_ics)} rows")
+    
+    create_committees_table(conn)
+    create_aggregate_tables(conn)
+    
+    # Statistiques pour le planificateur de requêtes
+    conn.execute("ANALYZE")
+    conn.commit()
+    report_query_plans(conn)
     
     conn.close()
     
@@ -307,43 +487,374 @@ def create_sqlite_db(df_standards):
     
     return 'iso_standards.db'
 
+def update_sqlite_db(df_standards):
+    """
+    Met à jour la base existante en place: les lignes ajoutées, modifiées ou
+    retirées sont appliquées à standards, standards_fts et standard_ics, puis
+    les agrégats sont recalculés. Sans changement, le fichier n'est pas modifié.
+    """
+    db_path = 'iso_standards.db'
+    if not Path(db_path).exists():
+        logger.info("No existing database, running a full build")
+        create_sqlite_db(df_standards)
+        return None
+    
+    df_export, final_cols = export_standards(df_standards)
+    
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {'standards', 'standards_fts', 'standard_ics'} <= tables:
+        conn.close()
+        logger.info("Database predates the current schema, running a full build")
+        create_sqlite_db(df_standards)
+        return None
+    
+    # Nouvelles lignes dans une table temporaire: la comparaison se fait en SQL,
+    # avec les mêmes conversions de types que la table standards
+    col_list = ', '.join(final_cols)
+    conn.execute(f"CREATE TEMP TABLE standards_new AS SELECT {col_list} FROM standards WHERE 0")
+    values = df_export[final_cols].astype(object).where(df_export[final_cols].notna(), None)
+    conn.executemany(
+        f"INSERT INTO standards_new VALUES ({', '.join('?' * len(final_cols))})",
+        values.itertuples(index=False, name=None),
+    )
+    
+    differs = ' OR '.join(f"o.{c} IS NOT n.{c}" for c in final_cols)
+    conn.executescript(f"""
+        CREATE TEMP TABLE removed AS
+            SELECT id FROM standards WHERE id NOT IN (SELECT id FROM standards_new);
+        CREATE TEMP TABLE added AS
+            SELECT id FROM standards_new WHERE id NOT IN (SELECT id FROM standards);
+        CREATE TEMP TABLE changed AS
+            SELECT n.id FROM standards_new n JOIN standards o ON o.id = n.id WHERE {differs};
+    """)
+    counts = {
+        name: conn.execute(f"SELECT COUNT(*) FROM temp.{name}").fetchone()[0]
+        for name in ('added', 'changed', 'removed')
+    }
+    logger.info(f"Database diff: +{counts['added']} added, ~{counts['changed']} changed, -{counts['removed']} removed")
+    
+    if not any(counts.values()):
+        conn.close()
+        logger.info("✓ Database up to date")
+        return counts
+    
+    # L'index FTS (external content) doit recevoir les anciennes valeurs avant
+    # la suppression des lignes, puis les nouvelles après insertion
+    touched = "SELECT id FROM temp.removed UNION ALL SELECT id FROM temp.changed"
+    upserted = "SELECT id FROM temp.added UNION ALL SELECT id FROM temp.changed"
+    with conn:
+        conn.execute(f"""
+            INSERT INTO standards_fts(standards_fts, rowid, id, title_en, full_text)
+            SELECT 'delete', rowid, id, title_en, full_text FROM standards WHERE id IN ({touched})
+        """)
+        conn.execute(f"DELETE FROM standard_ics WHERE standard_id IN ({touched})")
+        conn.execute(f"DELETE FROM standards WHERE id IN ({touched})")
+        conn.execute(f"INSERT INTO standards ({col_list}) SELECT {col_list} FROM standards_new WHERE id IN ({upserted})")
+        conn.execute(f"""
+            INSERT INTO standards_fts(rowid, id, title_en, full_text)
+            SELECT rowid, id, title_en, full_text FROM standards WHERE id IN ({upserted})
+        """)
+        if 'icsCode' in df_export.columns:
+            new_ids = {row[0] for row in conn.execute(upserted)}
+            df_ics = build_ics_mapping(df_export[df_export['id'].isin(new_ids)])
+            conn.executemany(
+                "INSERT INTO standard_ics (standard_id, ics_code, ics_group) VALUES (?, ?, ?)",
+                df_ics[['standard_id', 'ics_code', 'ics_group']].itertuples(index=False, name=None),
+            )
+    
+    create_committees_table(conn)
+    create_aggregate_tables(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    
+    logger.info(f"✓ Database updated in place: {db_path}")
+    return counts
+
 # =============================================================================
 # 4. GÉNÉRATION DES EMBEDDINGS
 # =============================================================================
 
+# Au-delà de cette part de lignes ajoutées/modifiées, les centroïdes IVF sont ré-entraînés
+INCREMENTAL_RETRAIN_FRACTION = 0.2
+
+def text_hashes(texts):
+    """Empreinte du texte encodé, pour ne ré-encoder que les standards modifiés"""
+    return [hashlib.blake2b(t.encode('utf-8'), digest_size=16).hexdigest() for t in texts]
+
+# Encodage en cours: tableau mémoire-mappé préalloué + point de reprise
+EMBEDDINGS_WORK_PATH = 'embeddings_work.npy'
+EMBEDDINGS_CHECKPOINT_PATH = 'embeddings_work.json'
+
+def load_checkpoint(signature, shape):
+    """Nombre de lignes déjà encodées pour ces textes (0 si rien à reprendre)"""
+    if not (Path(EMBEDDINGS_CHECKPOINT_PATH).exists() and Path(EMBEDDINGS_WORK_PATH).exists()):
+        return 0
+    try:
+        with open(EMBEDDINGS_CHECKPOINT_PATH) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if state.get('signature') != signature or tuple(state.get('shape', ())) != shape:
+        return 0
+    return int(state.get('done', 0))
+
+def save_checkpoint(signature, shape, done):
+    # Écriture atomique: un arrêt pendant l'écriture garde le point précédent
+    tmp_path = EMBEDDINGS_CHECKPOINT_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'signature': signature, 'shape': list(shape), 'done': done}, f)
+    os.replace(tmp_path, EMBEDDINGS_CHECKPOINT_PATH)
+
+def remove_checkpoint():
+    """Supprime le tableau de travail une fois les embeddings sauvegardés"""
+    for path in (EMBEDDINGS_WORK_PATH, EMBEDDINGS_CHECKPOINT_PATH):
+        Path(path).unlink(missing_ok=True)
+
+def encode_texts(texts):
+    """
+    Encode les textes (vecteurs normalisés) tranche par tranche dans un
+    tableau mémoire-mappé préalloué, avec un point de reprise après chaque
+    tranche: une exécution interrompue reprend là où elle s'est arrêtée.
+    Les textes sont triés par longueur pour limiter le padding des lots, et
+    répartis sur un pool de processus quand il y a plusieurs cœurs.
+    """
+    workers = config.EMBEDDING_WORKERS or os.cpu_count() or 1
+    batch_size = config.EMBEDDING_BATCH_SIZE
+    chunk_rows = config.EMBEDDING_CHECKPOINT_ROWS
+    
+    logger.info(f"Loading model '{config.EMBEDDING_MODEL}'...")
+    model = SentenceTransformer(config.EMBEDDING_MODEL)
+    shape = (len(texts), model.get_sentence_embedding_dimension())
+    
+    signature = hashlib.blake2b(
+        '\n'.join([config.EMBEDDING_MODEL] + text_hashes(texts)).encode('utf-8'), digest_size=16
+    ).hexdigest()
+    done = load_checkpoint(signature, shape)
+    if done:
+        out = np.lib.format.open_memmap(EMBEDDINGS_WORK_PATH, mode='r+')
+        logger.info(f"Resuming from checkpoint: {done}/{len(texts)} documents already encoded")
+    else:
+        out = np.lib.format.open_memmap(EMBEDDINGS_WORK_PATH, mode='w+', dtype=np.float32, shape=shape)
+    
+    # Tri par longueur: chaque tranche (et chaque lot) regroupe des textes de
+    # longueur proche, donc peu de padding
+    order = np.argsort([len(t) for t in texts], kind='stable')
+    remaining = len(texts) - done
+    
+    pool = None
+    if workers > 1 and remaining > chunk_rows:
+        # Un thread torch par processus: les processus se partagent les cœurs
+        previous = os.environ.get('OMP_NUM_THREADS')
+        os.environ['OMP_NUM_THREADS'] = '1'
+        try:
+            pool = model.start_multi_process_pool(target_devices=['cpu'] * workers)
+        finally:
+            if previous is None:
+                del os.environ['OMP_NUM_THREADS']
+            else:
+                os.environ['OMP_NUM_THREADS'] = previous
+    else:
+        workers = 1
+    
+    logger.info(f"Encoding {remaining} documents on {workers} core(s)...")
+    start_time = time.perf_counter()
+    try:
+        for start in range(done, len(texts), chunk_rows):
+            rows = order[start:start + chunk_rows]
+            chunk = [texts[i] for i in rows]
+            if pool is not None:
+                vectors = model.encode_multi_process(chunk, pool, batch_size=batch_size)
+            else:
+                vectors = model.encode(chunk, batch_size=batch_size, show_progress_bar=False)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            out[rows] = vectors
+            out.flush()
+            done = start + len(rows)
+            save_checkpoint(signature, shape, done)
+            logger.info(f"  {done}/{len(texts)} documents encoded")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    
+    elapsed = time.perf_counter() - start_time
+    if remaining and elapsed > 0:
+        rate = remaining / elapsed
+        logger.info(f"✓ Encoded {remaining} documents in {elapsed:.1f}s: "
+                    f"{rate:.1f} docs/sec ({rate / workers:.1f} docs/sec per core)")
+    return np.array(out)
+
+def metadata_arrays(rows):
+    """
+    Tableaux dérivés des métadonnées, dans l'ordre de `rows`: filtres de
+    recherche (année, comité, codes ICS) et champs affichés pour les
+    documents trouvés (sans requête SQL). Colonnes absentes = valeurs vides.
+    """
+    def column(name):
+        if name in rows.columns:
+            return rows[name]
+        return pd.Series([None] * len(rows), index=rows.index, dtype=object)
+    
+    arrays = build_filter_arrays(
+        pd.to_numeric(column('year'), errors='coerce').to_numpy(dtype=float, na_value=np.nan),
+        column('ownerCommittee').tolist(),
+        column('icsCode').fillna('').astype(str).str.findall(ICS_CODE_PATTERN).tolist(),
+    )
+    arrays.update(document_arrays({
+        'title_en': column('title_en').tolist(),
+        'abstract': column('scope_text').tolist(),
+    }))
+    return arrays
+
+def save_embedding_artifacts(embeddings, df_standards, hashes, index, order):
+    """
+    Réordonne selon l'index IVF et écrit un fichier unique (vector_index.bin):
+    vecteurs float32 + variantes compactes, IDs, empreintes des textes, index
+    IVF, index des métadonnées pour les filtres (année, comité, ICS), titres
+    et résumés des documents et métadonnées (modèle, dimension, date, hash du contenu)
+    """
+    # Index ANN (IVF): les lignes sont réordonnées par liste pour que
+    # chaque liste soit une tranche contiguë de la matrice
+    embeddings = embeddings[order]
+    codes, scales = quantize_int8(embeddings)
+    arrays = {
+        'vectors': embeddings,
+        'vectors_f16': embeddings.astype(np.float16),
+        'vectors_int8': codes,
+        'vectors_int8_scales': scales,
+        # IDs (reference sert d'ID) et empreinte du texte, dans l'ordre de l'index
+        'ids': encode_ids(df_standards['reference'].to_numpy()[order]),
+        'text_hashes': np.array(hashes, dtype='S32')[order],
+        'ivf_centroids': index.centroids,
+        'ivf_offsets': index.offsets,
+    }
+    arrays.update(metadata_arrays(df_standards.iloc[order]))
+    metadata = write_vector_index('vector_index.bin', arrays, model=config.EMBEDDING_MODEL, normalized=True)
+    
+    size_mb = Path('vector_index.bin').stat().st_size / 1024 / 1024
+    logger.info(f"✓ Embeddings saved: {embeddings.shape}, {index.n_lists} IVF lists ({size_mb:.1f} MB)")
+    logger.info(f"  model={metadata['model']} content_hash={metadata['content_hash']}")
+    return embeddings
+
 def prepare_embeddings(df_standards):
     """Génère les embeddings pour la recherche sémantique"""
     
     logger.info("Generating embeddings with SentenceTransformer...")
-    logger.info("Loading model 'all-MiniLM-L6-v2'...")
-    
-    model = SentenceTransformer('all-MiniLM-L6-v2')
     
     texts = df_standards['full_text'].fillna("").tolist()
-    logger.info(f"Encoding {len(texts)} documents (this may take a few minutes)...")
+    embeddings = encode_texts(texts)
     
-    embeddings = model.encode(
-        texts,
-        show_progress_bar=True,
-        batch_size=32,
-        normalize_embeddings=True
-    )
+    logger.info("Building IVF index...")
+    index, order = IVFIndex.build(embeddings, n_lists=config.ANN_N_LISTS)
+    embeddings = save_embedding_artifacts(embeddings, df_standards, text_hashes(texts), index, order)
+    remove_checkpoint()
+    report_index_recall(index, embeddings)
     
-    # Sauvegarde
-    np.save('embeddings.npy', embeddings)
-    # Sauvegarde des IDs correspondants (reference sert d'ID)
-    df_standards[['reference']].rename(columns={'reference': 'id'}).to_csv('embeddings_ids.csv', index=False)
+    return embeddings
+
+def update_embeddings(df_standards):
+    """
+    Mise à jour incrémentale: seuls les standards nouveaux ou dont le texte a
+    changé sont ré-encodés, les standards retirés sont supprimés. Les vecteurs
+    sont réassignés aux centroïdes IVF existants (ré-entraînés si une grande
+    part du corpus a changé).
+    """
+    if not Path('vector_index.bin').exists():
+        logger.info("No existing embeddings, running a full build")
+        prepare_embeddings(df_standards)
+        return None
+    try:
+        previous = VectorIndexFile.open('vector_index.bin', expected_model=config.EMBEDDING_MODEL)
+    except VectorIndexError as e:
+        # Autre modèle ou autre format: tout doit être ré-encodé
+        logger.info(f"{e}: running a full build")
+        prepare_embeddings(df_standards)
+        return None
     
-    size_mb = Path('embeddings.npy').stat().st_size / 1024 / 1024
-    logger.info(f"✓ Embeddings saved: {embeddings.shape} ({size_mb:.1f} MB)")
+    texts = df_standards['full_text'].fillna("").tolist()
+    ids = df_standards['reference'].to_numpy()
+    hashes = text_hashes(texts)
+    
+    old_ids = decode_ids(previous['ids'])
+    old_row = {doc_id: row for row, doc_id in enumerate(old_ids)}
+    old_hash = np.array(decode_ids(previous['text_hashes']), dtype=object)
+    rows = np.array([old_row.get(doc_id, -1) for doc_id in ids], dtype=np.int64)
+    known = rows >= 0
+    reuse = known.copy()
+    reuse[known] = old_hash[rows[known]] == np.asarray(hashes, dtype=object)[known]
+    counts = {
+        'added': int((~known).sum()),
+        'changed': int((known & ~reuse).sum()),
+        'removed': len(set(old_ids) - set(ids)),
+    }
+    logger.info(f"Embeddings diff: +{counts['added']} added, ~{counts['changed']} changed, -{counts['removed']} removed")
+    
+    if reuse.all() and len(ids) == len(old_ids):
+        # Textes inchangés: seules les métadonnées (année, comité, ICS...)
+        # peuvent avoir changé; les vecteurs et l'index IVF sont conservés
+        order = np.empty(len(ids), dtype=np.int64)
+        order[rows] = np.arange(len(ids))
+        fresh = metadata_arrays(df_standards.iloc[order])
+        if all(name in previous and previous[name].dtype == array.dtype and np.array_equal(previous[name], array)
+               for name, array in fresh.items()):
+            logger.info("✓ Embeddings up to date")
+            return counts
+        logger.info("Metadata changed, rewriting filter and document arrays")
+        arrays = {name: np.array(array) for name, array in previous.arrays.items()}
+        arrays.update(fresh)
+        normalized = previous.metadata['normalized']
+        del previous
+        write_vector_index('vector_index.bin', arrays, model=config.EMBEDDING_MODEL, normalized=normalized)
+        return counts
+    
+    embeddings = np.empty((len(ids), previous.metadata['dim']), dtype=np.float32)
+    embeddings[reuse] = previous['vectors'][rows[reuse]]
+    centroids = np.array(previous['ivf_centroids'])
+    # Le fichier est remplacé plus bas: on lâche le memory map avant
+    del previous
+    stale = np.flatnonzero(~reuse)
+    if len(stale):
+        embeddings[stale] = encode_texts([texts[i] for i in stale])
+    
+    if len(stale) > INCREMENTAL_RETRAIN_FRACTION * len(ids):
+        logger.info("Large update, rebuilding IVF index...")
+        index, order = IVFIndex.build(embeddings, n_lists=config.ANN_N_LISTS)
+    else:
+        index, order = IVFIndex.from_centroids(centroids, embeddings)
     
-    return embeddings
+    save_embedding_artifacts(embeddings, df_standards, hashes, index, order)
+    remove_checkpoint()
+    return counts
+
+def report_index_recall(index, embeddings, n_queries=200, top_k=5, n_probes=(1, 4, 8, 16, 32)):
+    """Compare recall@k de l'index IVF avec la recherche exacte (requêtes = documents du corpus)"""
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)]
+    exact = [exact_search(embeddings, q, top_k)[0] for q in queries]
+    
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            break
+        recalls = [
+            recall_at_k(index.search(embeddings, q, top_k, n_probe=n_probe)[0], e)
+            for q, e in zip(queries, exact)
+        ]
+        logger.info(f"  n_probe={n_probe:<3} recall@{top_k}={np.mean(recalls):.3f}")
 
 # =============================================================================
 # 5. SCRIPT PRINCIPAL
 # =============================================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="Download and prepare ISO Open Data")
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="update the existing database and embeddings in place instead of rebuilding them"
+    )
+    args = parser.parse_args()
+    
     logger.info("=" * 70)
     logger.info("ISO OPEN DATA - PREPARATION FOR RAG APPLICATION")
     logger.info("Source: https://www.iso.org/open-data.html")
@@ -364,21 +875,32 @@ def main():
         logger.error("No standards to process. Exiting.")
         sys.exit(1)
     
-    # Étape 3: Base de données
-    logger.info("\n[3/4] Creating SQLite database...")
-    create_sqlite_db(df_selected)
-    
-    # Étape 4: Embeddings
-    logger.info("\n[4/4] Generating embeddings...")
-    prepare_embeddings(df_selected)
+    if args.incremental:
+        # Étapes 3 et 4: mise à jour en place (seuls les changements sont appliqués)
+        logger.info("\n[3/4] Updating SQLite database...")
+        db_counts = update_sqlite_db(df_selected)
+        
+        logger.info("\n[4/4] Updating embeddings...")
+        emb_counts = update_embeddings(df_selected)
+        
+        for name, counts in (('Database', db_counts), ('Embeddings', emb_counts)):
+            if counts is not None:
+                logger.info(f"{name}: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed")
+    else:
+        # Étape 3: Base de données
+        logger.info("\n[3/4] Creating SQLite database...")
+        create_sqlite_db(df_selected)
+        
+        # Étape 4: Embeddings
+        logger.info("\n[4/4] Generating embeddings...")
+        prepare_embeddings(df_selected)
     
     logger.info("\n" + "=" * 70)
     logger.info("✓ PREPARATION COMPLETE")
     logger.info("=" * 70)
     logger.info("\nFiles created:")
     logger.info("- iso_standards.db")
-    logger.info("- embeddings.npy")
-    logger.info("- embeddings_ids.csv")
+    logger.info("- vector_index.bin (embeddings, ids, IVF index, metadata)")
     logger.info("\n→ Ready to adapt your RAG application!")
     logger.info("\nAttribution required:")
     logger.info('This work uses iso_deliverables_metadata from ISO Open Data')
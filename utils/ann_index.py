@@ -0,0 +1,167 @@
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file index over L2-normalized embeddings.
+
+    Vectors are clustered with spherical k-means and the embedding matrix is
+    stored sorted by cluster, so each inverted list is a contiguous slice of
+    the matrix. A query scores the centroids, then only the `n_probe` closest
+    lists. `n_probe` is the recall/latency knob.
+    """
+
+    def __init__(self, centroids, offsets):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def n_rows(self):
+        return int(self.offsets[-1])
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, n_iter=10, sample_size=None, seed=0):
+        """
+        Train the coarse quantizer and return (index, order), where `order`
+        is the row permutation that makes every list contiguous.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n = len(embeddings)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(seed)
+        sample_size = sample_size or min(n, 256 * n_lists)
+        sample = embeddings[rng.choice(n, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            # Re-seed empty clusters with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        return cls.from_centroids(centroids, embeddings)
+
+    @classmethod
+    def from_centroids(cls, centroids, embeddings):
+        """
+        Assign `embeddings` to existing (trained) centroids and return
+        (index, order) as in `build`, without re-running k-means.
+        """
+        centroids = np.asarray(centroids, dtype=np.float32)
+        assign = _assign(np.asarray(embeddings, dtype=np.float32), centroids)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(centroids, offsets), order
+
+    def search(self, embeddings, query_vec, top_k=5, n_probe=8, mask=None):
+        """
+        Return (row_indices, scores) of the best `top_k` rows of `embeddings`
+        (which must be in index order), best first. With a boolean `mask`,
+        only the rows where it is True are scored.
+        """
+        n_probe = min(n_probe, self.n_lists)
+        centroid_scores = self.centroids @ query_vec
+        if n_probe < self.n_lists:
+            probe = np.argpartition(centroid_scores, -n_probe)[-n_probe:]
+        else:
+            probe = np.arange(self.n_lists)
+
+        rows, scores = [], []
+        for lst in probe:
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            if start == end:
+                continue
+            if mask is None:
+                rows.append(np.arange(start, end))
+                scores.append(embeddings[start:end] @ query_vec)
+            else:
+                selected = np.flatnonzero(mask[start:end]) + start
+                if len(selected):
+                    rows.append(selected)
+                    scores.append(embeddings[selected] @ query_vec)
+        if not rows:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        rows = np.concatenate(rows)
+        scores = np.concatenate(scores)
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+
+def _assign(vectors, centroids, batch_size=65536):
+    """Nearest centroid (max inner product) for each vector, in batches."""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start:start + batch_size] @ centroids.T
+        assign[start:start + batch_size] = block.argmax(axis=1)
+    return assign
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the `top_k` highest scores, best first, in O(N)."""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.array([], dtype=np.int64)
+    if top_k < len(scores):
+        part = np.argpartition(scores, -top_k)[-top_k:]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(scores[part])[::-1]]
+
+
+def exact_search(embeddings, query_vec, top_k=5):
+    """Brute-force inner-product search. Returns (row_indices, scores)."""
+    scores = embeddings @ query_vec
+    best = top_k_indices(scores, top_k)
+    return best, scores[best]
+
+
+def exact_search_many(embeddings, query_vecs, top_k=5, block_size=65536):
+    """
+    Brute-force search for a batch of queries. Returns (rows, scores), both
+    of shape (n_queries, top_k), best first.
+
+    The corpus is scanned in blocks with one matrix-matrix product per block
+    and a running top-k, so memory stays at block_size x n_queries scores.
+    """
+    query_vecs = np.asarray(query_vecs, dtype=np.float32)
+    n_queries = len(query_vecs)
+    top_k = min(top_k, len(embeddings))
+    best_rows = np.empty((n_queries, 0), dtype=np.int64)
+    best_scores = np.empty((n_queries, 0), dtype=np.float32)
+
+    for start in range(0, len(embeddings), block_size):
+        end = min(start + block_size, len(embeddings))
+        block_scores = (embeddings[start:end] @ query_vecs.T).T
+        block_rows = np.broadcast_to(np.arange(start, end), block_scores.shape)
+
+        scores = np.concatenate([best_scores, block_scores], axis=1)
+        rows = np.concatenate([best_rows, block_rows], axis=1)
+        if scores.shape[1] > top_k:
+            part = np.argpartition(scores, -top_k, axis=1)[:, -top_k:]
+            scores = np.take_along_axis(scores, part, axis=1)
+            rows = np.take_along_axis(rows, part, axis=1)
+        best_scores, best_rows = scores, rows
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def recall_at_k(approx_rows, exact_rows):
+    """Fraction of the exact top-k rows that the approximate search returned."""
+    if len(exact_rows) == 0:
+        return 1.0
+    return len(set(np.asarray(approx_rows).tolist()) & set(np.asarray(exact_rows).tolist())) / len(exact_rows)
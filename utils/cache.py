@@ -0,0 +1,79 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Cache key for free text: lowercase, collapsed whitespace."""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and optionally by total size
+    in bytes (as reported to `put`), with optional TTL (seconds) and hit/miss
+    counters.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, max_bytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires, _ = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def put(self, key, value, size=0):
+        if self.maxsize <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self.nbytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "bytes": self.nbytes,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import config
+
+_local = threading.local()
+
+READ_PRAGMAS = {
+    "query_only": "ON",
+    "temp_store": "MEMORY",
+}
+
+
+def connect_readonly(db_path=None):
+    """Open a new read-only connection tuned for lookups and analytics."""
+    db_path = db_path or config.DB_PATH
+    uri = f"{Path(db_path).absolute().as_uri()}?mode=ro"
+    conn = sqlite3.connect(
+        uri,
+        uri=True,
+        cached_statements=config.SQLITE_CACHED_STATEMENTS,
+    )
+    pragmas = {
+        **READ_PRAGMAS,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        # Negative cache_size is in KiB
+        "cache_size": -(config.SQLITE_CACHE_SIZE // 1024),
+    }
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_connection(db_path=None):
+    """
+    Read-only connection owned by the calling thread, opened on first use and
+    reused afterwards (sqlite3 also keeps its prepared statements cached).
+    """
+    db_path = db_path or config.DB_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = connect_readonly(db_path)
+    return conn
+
+
+def close_connection(db_path=None):
+    """Close the calling thread's connection, e.g. after the DB was rebuilt."""
+    db_path = db_path or config.DB_PATH
+    conns = getattr(_local, "conns", {})
+    conn = conns.pop(db_path, None)
+    if conn is not None:
+        conn.close()
+
+
+def db_signature(db_path=None):
+    """Changes whenever the database file is rebuilt or modified."""
+    db_path = db_path or config.DB_PATH
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def result_columns(sql, db_path=None):
+    """
+    Column names `sql` returns, without running it: the outer LIMIT 0 stops
+    before the first row is computed.
+    """
+    cursor = get_connection(db_path).execute(f"SELECT * FROM (\n{sql.strip().rstrip(';')}\n) LIMIT 0")
+    columns = [c[0] for c in cursor.description]
+    cursor.close()
+    return columns
+
+
+def execute_guarded(sql, max_rows=None, timeout=None, db_path=None):
+    """
+    Run untrusted (LLM-written) SQL on the thread's read-only connection with
+    a wall-clock budget and a row cap. Rows are fetched in chunks and the
+    fetch stops as soon as the cap is reached.
+
+    Returns (columns, rows, meta) where meta reports rows returned, whether
+    the result was truncated or timed out, and the elapsed time. Raises
+    sqlite3 errors other than the budget interrupt.
+    """
+    max_rows = max_rows or config.SQL_MAX_ROWS
+    timeout = timeout or config.SQL_TIMEOUT
+    conn = get_connection(db_path)
+    deadline = time.monotonic() + timeout
+    start = time.monotonic()
+    timed_out = False
+
+    def check_deadline():
+        nonlocal timed_out
+        if time.monotonic() > deadline:
+            timed_out = True
+            return 1  # non-zero aborts the running statement
+        return 0
+
+    # Called every N SQLite VM instructions, so runaway joins are interrupted too
+    conn.set_progress_handler(check_deadline, config.SQL_PROGRESS_STEPS)
+    columns, rows, truncated = [], [], False
+    try:
+        cursor = conn.execute(sql)
+        columns = [c[0] for c in cursor.description or []]
+        while len(rows) <= max_rows:
+            chunk = cursor.fetchmany(config.SQL_FETCH_CHUNK)
+            if not chunk:
+                break
+            rows.extend(chunk)
+        if len(rows) > max_rows:
+            truncated = True
+            rows = rows[:max_rows]
+        cursor.close()
+    except sqlite3.OperationalError:
+        if not timed_out:
+            raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+    meta = {
+        "rows": len(rows),
+        "truncated": truncated,
+        "timed_out": timed_out,
+        "max_rows": max_rows,
+        "elapsed": time.monotonic() - start,
+    }
+    return columns, rows, meta
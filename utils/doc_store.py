@@ -0,0 +1,83 @@
+import threading
+import time
+import numpy as np
+
+# Text fields shown to the LLM and in the sources panel (besides the id)
+FIELDS = ("title_en", "abstract")
+
+
+def encode_strings(values):
+    """Arrow large_string layout: (int64 offsets, UTF-8 bytes). Missing values become ''."""
+    encoded = [v.encode("utf-8") if isinstance(v, str) else b"" for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def document_arrays(columns):
+    """Arrays stored in the vector index file for {field: values in row order}."""
+    arrays = {}
+    for field in FIELDS:
+        offsets, data = encode_strings(columns[field])
+        arrays[f"doc_{field}_offsets"] = offsets
+        arrays[f"doc_{field}_data"] = data
+    return arrays
+
+
+class DocumentStore:
+    """
+    Id, title and abstract of every standard indexed by embedding row, as
+    views of the memory-mapped vector index file (Arrow large_string layout,
+    read without pyarrow so the engine stays light to import). Fetching the
+    top-k documents is a few slices: no SQL round trip, and the documents
+    come back in the order of the requested rows.
+    """
+
+    def __init__(self, ids, columns):
+        self.ids = ids
+        self.columns = columns
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """None when the vector index was built without document columns."""
+        names = [f"doc_{field}_{part}" for field in FIELDS for part in ("offsets", "data")]
+        if not all(name in artifact for name in names):
+            return None
+        columns = {
+            field: (artifact[f"doc_{field}_offsets"], memoryview(artifact[f"doc_{field}_data"]))
+            for field in FIELDS
+        }
+        return cls(artifact["ids"], columns)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + sum(offsets.nbytes + data.nbytes for offsets, data in self.columns.values())
+
+    def get(self, rows):
+        """Documents (dicts with id and FIELDS) for `rows`, in the same order."""
+        start = time.perf_counter()
+        docs = []
+        for row in rows:
+            doc = {"id": self.ids[row].decode("utf-8")}
+            for field, (offsets, data) in self.columns.items():
+                doc[field] = str(data[offsets[row]:offsets[row + 1]], "utf-8")
+            docs.append(doc)
+        with self._lock:
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - start
+        return docs
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self),
+                "bytes": int(self.nbytes),
+                "lookups": self.lookups,
+                "avg_lookup_ms": 1000 * self.lookup_seconds / self.lookups if self.lookups else None,
+            }
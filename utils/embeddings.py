@@ -1,40 +1,280 @@
-
+import os
+import threading
 import numpy as np
-import pandas as pd
-import sqlite3
-from sentence_transformers import SentenceTransformer
 import config
+from utils.ann_index import IVFIndex, exact_search, exact_search_many, top_k_indices
+from utils.quantization import VectorStore
+from utils.vector_index import STORAGE_ARRAYS, VectorIndexFile, decode_ids
+from utils.metadata_filter import MetadataIndex
+from utils.doc_store import DocumentStore
+from utils.cache import LRUCache, normalize_text
+from utils.startup import startup_timer
+
+class IndexSnapshot:
+    """
+    Everything loaded from one version of the vector index file: vectors,
+    ids, ANN index, metadata filters and document store. Never modified once
+    built, so a search that holds a snapshot sees consistent arrays even if
+    the engine swaps in a newer one meanwhile.
+    """
+
+    def __init__(self, data_version=None, embeddings=None, full_embeddings=None, ids=None,
+                 index=None, filter_index=None, doc_store=None, metadata=None):
+        self.data_version = data_version
+        self.embeddings = np.array([]) if embeddings is None else embeddings
+        self.full_embeddings = self.embeddings if full_embeddings is None else full_embeddings
+        self.ids = np.array([], dtype="S1") if ids is None else ids
+        self.index = index
+        self.filter_index = filter_index
+        self.doc_store = doc_store
+        self.metadata = metadata or {}
+        self._row_of_id = None
+
+    @classmethod
+    def load(cls, data_version):
+        try:
+            # One memory-mapped file: every array below is a view into it
+            artifact = VectorIndexFile.open(
+                config.VECTOR_INDEX_PATH, expected_model=config.EMBEDDING_MODEL, mmap=config.EMBEDDINGS_MMAP
+            )
+            # Full precision matrix (for rescoring) + compact matrix used for scoring
+            full_embeddings = VectorStore(artifact["vectors"])
+            name, scales_name = STORAGE_ARRAYS[config.EMBEDDINGS_DTYPE]
+            if config.EMBEDDINGS_DTYPE == "float32" or name not in artifact:
+                embeddings = full_embeddings
+            else:
+                # Scales are small: keep them in RAM for fast dequantization
+                scales = np.array(artifact[scales_name]) if scales_name else None
+                embeddings = VectorStore(artifact[name], scales)
+            snapshot = cls(
+                data_version, embeddings, full_embeddings, artifact["ids"],
+                index=cls._load_index(artifact, len(embeddings)),
+                filter_index=MetadataIndex.from_artifact(artifact),
+                doc_store=DocumentStore.from_artifact(artifact),
+                metadata={k: v for k, v in artifact.metadata.items() if k != "arrays"},
+            )
+            print(f"Loaded embeddings: {embeddings.shape} ({embeddings.dtype}), "
+                  f"model {snapshot.metadata['model']}, built {snapshot.metadata['built_at']}")
+            if snapshot.doc_store is not None:
+                print(f"Loaded document store: {len(snapshot.doc_store)} docs "
+                      f"({snapshot.doc_store.nbytes / 1024 / 1024:.1f} MB)")
+            return snapshot
+        except Exception as e:
+            print(f"Error loading embeddings: {e}")
+            # Empty if the file doesn't exist yet
+            return cls(data_version)
+
+    @staticmethod
+    def _load_index(artifact, n_rows):
+        # ANN index is optional: without it (or if it is stale) we search exactly
+        if "ivf_centroids" not in artifact:
+            return None
+        index = IVFIndex(artifact["ivf_centroids"], artifact["ivf_offsets"])
+        if index.n_rows != n_rows:
+            print("ANN index does not match embeddings, using exact search")
+            return None
+        print(f"Loaded ANN index: {index.n_lists} lists")
+        return index
+
+    def filter_mask(self, filters):
+        """Boolean mask of the rows matching `filters` (None = no constraint)."""
+        if not filters:
+            return None
+        if self.filter_index is None:
+            print("Vector index has no metadata arrays, ignoring search filters")
+            return None
+        return self.filter_index.mask(filters)
+
+    def filter_ids(self, ids, filters):
+        """Keep the ids (e.g. from BM25) whose rows match `filters`."""
+        mask = self.filter_mask(filters)
+        if mask is None:
+            return list(ids)
+        rows = self.rows_of(ids)
+        return [doc_id for doc_id, row in zip(ids, rows) if row is not None and mask[row]]
+
+    def rows_of(self, ids):
+        """Row index of each id (None if unknown), in the same order."""
+        if self._row_of_id is None:
+            self._row_of_id = {doc_id: row for row, doc_id in enumerate(decode_ids(self.ids))}
+        return [self._row_of_id.get(doc_id) for doc_id in ids]
+
+    def search_vector(self, query_vec, top_k=5, exact=False, mask=None):
+        """
+        Return (row_indices, scores) for a normalized query vector, restricted
+        to the rows where `mask` is True if given.
+        """
+        rescore = self.embeddings is not self.full_embeddings and config.EMBEDDINGS_RESCORE_FACTOR > 0
+        n_candidates = top_k * config.EMBEDDINGS_RESCORE_FACTOR if rescore else top_k
+        use_index = self.index is not None and not exact and config.ANN_NPROBE < self.index.n_lists
+
+        if mask is not None:
+            subset = np.flatnonzero(mask)
+            rows = None
+            if use_index and len(subset) > config.FILTER_EXACT_MAX_ROWS:
+                rows, scores = self.index.search(
+                    self.embeddings, query_vec, n_candidates, n_probe=config.ANN_NPROBE, mask=mask
+                )
+            if rows is None or len(rows) < min(n_candidates, len(subset)):
+                # Few matching rows (or too few in the probed lists): exact scan of the subset
+                scores = self.embeddings[subset] @ query_vec
+                best = top_k_indices(scores, n_candidates)
+                rows, scores = subset[best], scores[best]
+        elif use_index:
+            rows, scores = self.index.search(self.embeddings, query_vec, n_candidates, n_probe=config.ANN_NPROBE)
+        else:
+            rows, scores = exact_search(self.embeddings, query_vec, n_candidates)
+
+        if rescore:
+            # Rescore the compact-precision candidates against float32 vectors
+            rows = np.sort(rows)
+            scores = self.full_embeddings[rows] @ query_vec
+            best = top_k_indices(scores, top_k)
+            rows, scores = rows[best], scores[best]
+        return rows, scores
+
 
 class EmbeddingEngine:
+    """
+    Query encoding and vector search over the current IndexSnapshot. When
+    the file on disk changes, a new snapshot is built and swapped in with a
+    single assignment under a lock; each search reads `self.snapshot` once.
+    """
+
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.embeddings = None
-        self.ids_df = None
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.snapshot = IndexSnapshot()
+        # Query text -> {"vector": query embedding, "results": {(data_version, top_k, exact, filters): ids}}
+        self.cache = LRUCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
         self.load_data()
 
+    @property
+    def model(self):
+        # sentence_transformers (and torch) is imported on first use only
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    with startup_timer.step("import sentence_transformers"):
+                        from sentence_transformers import SentenceTransformer
+                    with startup_timer.step("load SentenceTransformer model"):
+                        self._model = SentenceTransformer(config.EMBEDDING_MODEL)
+        return self._model
+
+    # Fields of the current snapshot
+    embeddings = property(lambda self: self.snapshot.embeddings)
+    full_embeddings = property(lambda self: self.snapshot.full_embeddings)
+    ids = property(lambda self: self.snapshot.ids)
+    index = property(lambda self: self.snapshot.index)
+    filter_index = property(lambda self: self.snapshot.filter_index)
+    doc_store = property(lambda self: self.snapshot.doc_store)
+    metadata = property(lambda self: self.snapshot.metadata)
+    data_version = property(lambda self: self.snapshot.data_version)
+
     def load_data(self):
-        try:
-            self.embeddings = np.load(config.EMBEDDINGS_PATH)
-            self.ids_df = pd.read_csv(config.EMBEDDINGS_IDS_PATH)
-            print(f"Loaded embeddings: {self.embeddings.shape}")
-        except Exception as e:
-            print(f"Error loading embeddings: {e}")
-            # Initialize empty if files don't exist yet
-            self.embeddings = np.array([])
-            self.ids_df = pd.DataFrame()
+        with self._reload_lock:
+            self._swap(IndexSnapshot.load(self._data_signature()))
 
-    def search(self, query, top_k=5):
-        if self.embeddings.size == 0:
+    def _swap(self, snapshot):
+        # Called with _reload_lock held
+        self.snapshot = snapshot
+        self.cache.clear()
+
+    def filter_mask(self, filters):
+        return self.snapshot.filter_mask(filters)
+
+    def filter_ids(self, ids, filters):
+        return self.snapshot.filter_ids(ids, filters)
+
+    def rows_of(self, ids):
+        return self.snapshot.rows_of(ids)
+
+    def search_vector(self, query_vec, top_k=5, exact=False, mask=None):
+        return self.snapshot.search_vector(query_vec, top_k, exact, mask)
+
+    def _data_signature(self):
+        if not os.path.exists(config.VECTOR_INDEX_PATH):
+            return None
+        stat = os.stat(config.VECTOR_INDEX_PATH)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def check_data_version(self):
+        """Reload embeddings and drop cached queries if the file on disk changed."""
+        if self._data_signature() == self.snapshot.data_version:
+            return
+        with self._reload_lock:
+            # Another thread may have reloaded while we waited
+            signature = self._data_signature()
+            if signature != self.snapshot.data_version:
+                print("Embeddings changed on disk, reloading")
+                self._swap(IndexSnapshot.load(signature))
+
+    def _cache_entry(self, query):
+        key = normalize_text(query)
+        entry = self.cache.get(key)
+        if entry is None:
+            vector = self.model.encode([query], normalize_embeddings=True)[0]
+            entry = {"vector": vector, "results": {}}
+            self.cache.put(key, entry)
+        return entry
+
+    def encode_query(self, query):
+        """Normalized query embedding, served from the query cache when possible."""
+        return self._cache_entry(query)["vector"]
+
+    def search(self, query, top_k=5, exact=False, filters=None):
+        """
+        Ids of the `top_k` closest standards. `filters` (a SearchFilters)
+        restricts results to a year range, committees and ICS prefixes.
+        """
+        self.check_data_version()
+        snapshot = self.snapshot
+        if snapshot.embeddings.size == 0:
             return []
 
-        # Encode query
-        query_emb = self.model.encode([query])
-        
-        # Calculate cosine similarity
-        similarities = np.dot(self.embeddings, query_emb.T).flatten()
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-        
-        # Retrieve IDs
-        top_ids = self.ids_df.iloc[top_indices]['id'].tolist()
-        
-        return top_ids
+        entry = self._cache_entry(query)
+        # Keyed by data version: results from a replaced snapshot are never served
+        key = (snapshot.data_version, top_k, exact, filters or None)
+        top_ids = entry["results"].get(key)
+        if top_ids is None:
+            # Cosine similarity (vectors are normalized), approximate if an index is loaded
+            mask = snapshot.filter_mask(filters)
+            top_indices, _ = snapshot.search_vector(entry["vector"], top_k, exact=exact, mask=mask)
+
+            # Retrieve IDs
+            top_ids = decode_ids(snapshot.ids[top_indices])
+            entry["results"][key] = top_ids
+
+        return list(top_ids)
+
+    def iter_search_many(self, queries, top_k=5, batch_size=None):
+        """
+        Exact search for many queries, yielding (ids, scores) per query in
+        input order. Queries are encoded and scored one batch at a time, so
+        arbitrarily long query lists stream with bounded memory.
+        """
+        if self.embeddings.size == 0:
+            for _ in queries:
+                yield [], []
+            return
+
+        batch_size = batch_size or config.SEARCH_BATCH_SIZE
+        batch = []
+        for query in queries:
+            batch.append(query)
+            if len(batch) == batch_size:
+                yield from self._search_batch(batch, top_k)
+                batch = []
+        if batch:
+            yield from self._search_batch(batch, top_k)
+
+    def search_many(self, queries, top_k=5, batch_size=None):
+        return list(self.iter_search_many(queries, top_k, batch_size))
+
+    def _search_batch(self, queries, top_k):
+        snapshot = self.snapshot
+        query_embs = self.model.encode(queries, batch_size=len(queries), normalize_embeddings=True)
+        rows, scores = exact_search_many(snapshot.full_embeddings, query_embs, top_k)
+        for row_ids, row_scores in zip(rows, scores):
+            yield decode_ids(snapshot.ids[row_ids]), row_scores.tolist()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+import requests
+
+CHUNK_SIZE = 1024 * 1024  # bytes per downloaded chunk
+BLOCK_SIZE = 16 * 1024 * 1024  # bytes of CSV parsed per Arrow batch
+
+
+def _meta_path(path):
+    return path.with_name(path.name + '.meta.json')
+
+
+def _load_meta(path, url):
+    try:
+        with open(_meta_path(path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Validators of another URL say nothing about this one
+    return meta if meta.get('url') == url else {}
+
+
+def _save_meta(path, meta):
+    tmp_path = _meta_path(path).with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(path))
+
+
+def _sha256(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _open_local(url, known, resume, chunk_size, **_):
+    """file:// source; mtime and size stand in for an ETag."""
+    source = Path(url2pathname(urlparse(url).path))
+    stat = source.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if known.get('etag') == etag:
+        yield 'unchanged', etag, None, iter(())
+        return
+    offset = resume[0] if resume and resume[1] == etag else 0
+    with open(source, 'rb') as f:
+        f.seek(offset)
+        yield ('partial' if offset else 'full'), etag, None, iter(lambda: f.read(chunk_size), b'')
+
+
+@contextmanager
+def _open_http(url, known, resume, chunk_size, timeout=60, session=None):
+    headers = {}
+    if resume:
+        headers['Range'] = f'bytes={resume[0]}-'
+        headers['If-Range'] = resume[1]
+    else:
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+    with (session or requests).get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            yield 'unchanged', known.get('etag'), known.get('last_modified'), iter(())
+            return
+        if response.status_code == 416 and resume:
+            # The partial file already holds the whole (unchanged) body
+            validator = resume[1]
+            quoted = validator.startswith(('"', 'W/'))
+            yield 'partial', validator if quoted else None, None if quoted else validator, iter(())
+            return
+        response.raise_for_status()
+        # 206 only if the If-Range validator still matches, otherwise a full 200
+        status = 'partial' if response.status_code == 206 else 'full'
+        yield status, response.headers.get('ETag'), response.headers.get('Last-Modified'), \
+            response.iter_content(chunk_size)
+
+
+def download(url, path, chunk_size=CHUNK_SIZE, timeout=60, session=None):
+    """
+    Stream `url` (http(s):// or file://) to `path` chunk by chunk.
+
+    Validators (ETag / Last-Modified) are kept in `<path>.meta.json`: an
+    unchanged remote file is answered by a conditional request without a
+    body, and an interrupted download resumes from `<path>.part` with a
+    Range request as long as the remote version is the same. Returns True
+    when the content of `path` changed, False otherwise.
+    """
+    path = Path(path)
+    part = path.with_name(path.name + '.part')
+    meta = _load_meta(path, url)
+    known = meta if path.exists() else {}
+    resume = None
+    if part.exists() and meta.get('part_validator'):
+        resume = (part.stat().st_size, meta['part_validator'])
+
+    opener = _open_local if urlparse(url).scheme == 'file' else _open_http
+    with opener(url, known, resume, chunk_size, timeout=timeout, session=session) as (status, etag, last_modified, chunks):
+        if status == 'unchanged':
+            return False
+        # Validator of the version being written, so a later run can resume it
+        validator = etag if etag and not etag.startswith('W/') else last_modified
+        _save_meta(path, {**meta, 'url': url, 'part_validator': validator})
+        with open(part, 'ab' if status == 'partial' else 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    digest = _sha256(part)
+    changed = not (path.exists() and digest == meta.get('sha256'))
+    if changed:
+        os.replace(part, path)
+    else:
+        # Servers without validators: same bytes, keep the existing file
+        part.unlink()
+    _save_meta(path, {'url': url, 'etag': etag, 'last_modified': last_modified, 'sha256': digest})
+    return changed
+
+
+def csv_to_parquet(csv_path, parquet_path, block_size=BLOCK_SIZE, skip_bad_lines=False):
+    """
+    Convert a CSV file to Parquet one Arrow batch at a time, so memory is
+    bounded by `block_size` rather than the file size. Every column is read
+    as a nullable string: a type inferred from the first block could not
+    hold later rows, and the callers already convert the columns they use.
+    Returns the number of rows written.
+    """
+    read_options = pv.ReadOptions(block_size=block_size)
+    parse_options = pv.ParseOptions(
+        newlines_in_values=True,
+        invalid_row_handler=(lambda row: 'skip') if skip_bad_lines else None,
+    )
+    with pv.open_csv(csv_path, read_options=read_options, parse_options=parse_options) as reader:
+        names = reader.schema.names
+    convert_options = pv.ConvertOptions(
+        column_types={name: pa.string() for name in names},
+        strings_can_be_null=True,
+    )
+
+    tmp_path = Path(str(parquet_path) + '.tmp')
+    n_rows = 0
+    with pv.open_csv(csv_path, read_options=read_options, parse_options=parse_options,
+                     convert_options=convert_options) as reader:
+        with pq.ParquetWriter(tmp_path, reader.schema, compression='zstd') as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                n_rows += batch.num_rows
+    os.replace(tmp_path, parquet_path)
+    return n_rows
+
+
+def ingest_csv(url, csv_path, parquet_path, skip_bad_lines=False, session=None):
+    """
+    Download `url` to `csv_path` and convert it to `parquet_path`, skipping
+    the conversion when the CSV is unchanged and the Parquet file is up to
+    date. Returns (changed, n_rows); n_rows is None when nothing was done.
+    """
+    csv_path, parquet_path = Path(csv_path), Path(parquet_path)
+    changed = download(url, csv_path, session=session)
+    if (not changed and parquet_path.exists()
+            and parquet_path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns):
+        return False, None
+    return changed, csv_to_parquet(csv_path, parquet_path, skip_bad_lines=skip_bad_lines)
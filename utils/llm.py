@@ -0,0 +1,320 @@
+import os
+import random
+import threading
+import time
+import config
+from utils.streaming import ThinkStripper, strip_think
+from utils.token_budget import estimate_tokens
+
+
+class TransientLLMError(Exception):
+    """Timeout, connection error or server error: worth retrying."""
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed before an answer (retries included)."""
+
+
+class RateLimited(TransientLLMError):
+    """HTTP 429. `retry_after` (seconds) is the server's hint, if any."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GroqBackend:
+    """
+    Groq chat completions over one pooled HTTP client. The SDK's own retries
+    are disabled: the gateway retries, so that rate limits are shared.
+    """
+
+    def __init__(self, max_connections=None):
+        self.max_connections = max_connections or config.LLM_MAX_CONCURRENCY
+        self._client = None
+        self._http_client = None
+        self._api_key = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Created on first call, and again if the key entered in the sidebar changes
+        api_key = os.environ.get("GROQ_API_KEY")
+        with self._lock:
+            if self._client is None or api_key != self._api_key:
+                import httpx
+                from groq import Groq
+                if self._http_client is not None:
+                    # Release the pooled connections of the client being replaced
+                    self._http_client.close()
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                self._http_client = httpx.Client(limits=limits, timeout=config.LLM_TIMEOUT)
+                self._client = Groq(api_key=api_key, max_retries=0, http_client=self._http_client)
+                self._api_key = api_key
+            return self._client
+
+    def _call(self, **kwargs):
+        import groq
+        try:
+            return self.client.chat.completions.create(**kwargs)
+        except groq.RateLimitError as e:
+            retry_after = e.response.headers.get("retry-after")
+            raise RateLimited(str(e), float(retry_after) if retry_after else None) from e
+        except (groq.APITimeoutError, groq.APIConnectionError, groq.InternalServerError) as e:
+            raise TransientLLMError(str(e)) from e
+
+    def complete(self, messages, model, timeout):
+        """(text, usage dict or None)."""
+        completion = self._call(messages=messages, model=model, timeout=timeout)
+        usage = completion.usage
+        return completion.choices[0].message.content, (
+            {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+            if usage else None
+        )
+
+    def stream(self, messages, model, timeout):
+        """Yields (text delta, usage dict or None); usage comes with the last chunk."""
+        for chunk in self._call(messages=messages, model=model, timeout=timeout, stream=True):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            yield delta or "", (
+                {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+                if usage else None
+            )
+
+
+class FakeBackend:
+    """
+    Offline stand-in for load tests: answers after a simulated latency
+    (LLM_FAKE_LATENCY +/- LLM_FAKE_JITTER seconds), streams at
+    LLM_FAKE_TOKENS_PER_SECOND and fails with a rate limit at
+    LLM_FAKE_FAILURE_RATE. SQL prompts get a valid query on the summary
+    tables, other prompts a short answer wrapped in a think block.
+    """
+
+    def __init__(self, latency=None, jitter=None, tokens_per_second=None, failure_rate=None, seed=None):
+        self.latency = config.LLM_FAKE_LATENCY if latency is None else latency
+        self.jitter = config.LLM_FAKE_JITTER if jitter is None else jitter
+        self.tokens_per_second = tokens_per_second or config.LLM_FAKE_TOKENS_PER_SECOND
+        self.failure_rate = config.LLM_FAKE_FAILURE_RATE if failure_rate is None else failure_rate
+        self._random = random.Random(seed)
+
+    def _reply(self, messages):
+        system, query = messages[0]["content"], messages[-1]["content"]
+        if "Generate a SQL query" in system:
+            return "<think>Counts per year are pre-aggregated.</think>SELECT year, count FROM agg_year ORDER BY year"
+        return f"<think>Drafting an answer.</think>Offline answer to: {query} ({estimate_tokens(system)} prompt tokens)"
+
+    def _wait(self, timeout):
+        delay = max(0.0, self._random.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TransientLLMError(f"fake backend timed out after {timeout}s")
+        time.sleep(delay)
+        if self._random.random() < self.failure_rate:
+            raise RateLimited("fake backend rate limit", retry_after=self._random.uniform(0, 0.2))
+
+    def complete(self, messages, model, timeout):
+        self._wait(timeout)
+        text = self._reply(messages)
+        return text, {"prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages),
+                      "completion_tokens": estimate_tokens(text)}
+
+    def stream(self, messages, model, timeout):
+        self._wait(timeout)
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            time.sleep(1 / self.tokens_per_second)
+            yield (word if i == 0 else " " + word), None
+
+
+BACKENDS = {"groq": GroqBackend, "fake": FakeBackend}
+
+
+class LLMGateway:
+    """
+    The one entry point for LLM calls. Keeps at most LLM_MAX_CONCURRENCY
+    calls in flight and retries transient errors with full-jitter
+    exponential backoff. On HTTP 429 every caller pauses until the server's
+    retry-after has passed. Each attempt has a timeout (LLM_TIMEOUT), and a
+    `deadline` (time.monotonic() value, e.g. the end of the orchestrator
+    stage) bounds the whole call: attempts are cut to the time left and no
+    retry starts past it, so an abandoned call frees its slot in time. Calls
+    end LLM_DEADLINE_MARGIN early and raise DeadlineExceeded, so the caller
+    sees a timeout rather than the backend's own timeout error.
+    Returns the visible answer (think blocks removed) and accounts calls,
+    retries, tokens and latency per `purpose` (the calling agent).
+    """
+
+    def __init__(self, backend=None, max_concurrency=None, max_retries=None):
+        self.backend = backend or BACKENDS[config.LLM_BACKEND]()
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._slots = threading.BoundedSemaphore(max_concurrency or config.LLM_MAX_CONCURRENCY)
+        self._paused_until = 0.0
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+        if isinstance(error, RateLimited):
+            delay = max(delay, error.retry_after or 0)
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def _attempt_timeout(self, timeout, deadline):
+        """Timeout of the next attempt: `timeout` cut to the time left before `deadline`."""
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("LLM call deadline passed")
+        return min(timeout, remaining)
+
+    def _wait_for_rate_limit(self, deadline):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceeded("LLM call deadline passes during the rate limit pause")
+            time.sleep(delay)
+
+    def _acquire_slot(self, deadline):
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not self._slots.acquire(timeout=timeout):
+            raise DeadlineExceeded("LLM call deadline passed waiting for a free slot")
+
+    def _call_deadline(self, deadline):
+        return None if deadline is None else deadline - config.LLM_DEADLINE_MARGIN
+
+    def _check_deadline(self, error, deadline):
+        """A failure with no retry left at or past `deadline` is a timeout: raise DeadlineExceeded."""
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded(f"LLM call deadline passed: {error}") from error
+
+    def _retry_delay(self, attempt, error, deadline):
+        """Backoff before the next attempt, or None when no retry fits before `deadline`."""
+        if attempt == self.max_retries:
+            return None
+        delay = self._backoff(attempt, error)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _record(self, purpose, seconds, usage=None, messages=None, text="", retries=0, error=False):
+        if usage is None:
+            # Backend gave no usage: local estimate
+            usage = {"prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages or []),
+                     "completion_tokens": estimate_tokens(text)}
+        with self._lock:
+            entry = self._usage.setdefault(purpose, {
+                "calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0,
+            })
+            entry["calls"] += 1
+            entry["errors"] += error
+            entry["retries"] += retries
+            entry["seconds"] += seconds
+            if not error:
+                entry["prompt_tokens"] += usage["prompt_tokens"]
+                entry["completion_tokens"] += usage["completion_tokens"]
+
+    def complete(self, messages, purpose="llm", model=None, timeout=None, deadline=None):
+        """Answer text without think blocks."""
+        model = model or config.GROQ_MODEL
+        timeout = timeout or config.LLM_TIMEOUT
+        deadline = self._call_deadline(deadline)
+        start = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._wait_for_rate_limit(deadline)
+                self._acquire_slot(deadline)
+                try:
+                    text, usage = self.backend.complete(messages, model, self._attempt_timeout(timeout, deadline))
+                finally:
+                    self._slots.release()
+                break
+            except DeadlineExceeded:
+                self._record(purpose, time.monotonic() - start, retries=attempt, error=True)
+                raise
+            except TransientLLMError as e:
+                delay = self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    self._record(purpose, time.monotonic() - start, retries=attempt, error=True)
+                    self._check_deadline(e, deadline)
+                    raise
+                print(f"LLM call ({purpose}) failed: {e}; retrying in {delay:.2f}s")
+                time.sleep(delay)
+            except Exception:
+                # Not retryable (authentication, bad request...): counted, then raised
+                self._record(purpose, time.monotonic() - start, retries=attempt, error=True)
+                raise
+        self._record(purpose, time.monotonic() - start, usage, messages, text, retries=attempt)
+        return strip_think(text)
+
+    def stream(self, messages, purpose="llm", model=None, timeout=None, deadline=None):
+        """
+        Yield the visible answer as it arrives. A failure before the first
+        chunk is retried like `complete`; after it, the error propagates.
+        Past `deadline` the stream stops with DeadlineExceeded.
+        """
+        model = model or config.GROQ_MODEL
+        timeout = timeout or config.LLM_TIMEOUT
+        deadline = self._call_deadline(deadline)
+        start = time.monotonic()
+        stripper = ThinkStripper()
+        text, usage = [], None
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._wait_for_rate_limit(deadline)
+                self._acquire_slot(deadline)
+                try:
+                    chunks = self.backend.stream(messages, model, self._attempt_timeout(timeout, deadline))
+                    for delta, chunk_usage in chunks:
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise DeadlineExceeded("LLM stream deadline passed")
+                        text.append(delta)
+                        usage = chunk_usage or usage
+                        visible = stripper.feed(delta)
+                        if visible:
+                            yield visible
+                finally:
+                    self._slots.release()
+                break
+            except DeadlineExceeded:
+                self._record(purpose, time.monotonic() - start, retries=attempt, error=True)
+                raise
+            except TransientLLMError as e:
+                delay = None if text else self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    self._record(purpose, time.monotonic() - start, retries=attempt, error=True)
+                    self._check_deadline(e, deadline)
+                    raise
+                print(f"LLM stream ({purpose}) failed: {e}; retrying in {delay:.2f}s")
+                time.sleep(delay)
+            except Exception:
+                self._record(purpose, time.monotonic() - start, retries=attempt, error=True)
+                raise
+        tail = stripper.flush()
+        if tail:
+            yield tail
+        self._record(purpose, time.monotonic() - start, usage, messages, "".join(text), retries=attempt)
+
+    def stats(self):
+        with self._lock:
+            return {
+                purpose: {**entry, "avg_seconds": entry["seconds"] / entry["calls"]}
+                for purpose, entry in self._usage.items()
+            }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway shared by the agents."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -0,0 +1,150 @@
+import re
+import time
+from dataclasses import dataclass
+import numpy as np
+import config
+from utils.sql_templates import year_range
+
+_COMMITTEE_PATTERN = re.compile(r"\b(?:iso/)?(?:iec\s+)?((?:jtc|tc)\s*\d+(?:\s*/\s*sc\s*\d+)?)\b", re.IGNORECASE)
+_ICS_PATTERN = re.compile(r"\bics\s*(?:code\s*)?(\d{2}(?:\.\d{3}(?:\.\d{2})?)?)", re.IGNORECASE)
+
+
+def normalize_committee(value):
+    """'ISO/TC307' and 'tc 307' become 'TC 307', 'ISO/IEC JTC 1/SC 27' becomes 'JTC 1/SC 27'."""
+    value = re.sub(r"\s+", " ", str(value).strip().upper())
+    value = re.sub(r"^(?:ISO/)?(?:IEC )?", "", value)
+    value = re.sub(r"([A-Z])(\d)", r"\1 \2", value)
+    return re.sub(r"\s*/\s*", "/", value)
+
+
+def normalize_ics_prefix(value):
+    """'35.*', '35.' and '35' are the same prefix."""
+    return str(value).strip().rstrip("*").rstrip(".")
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Hard constraints on search results. None / empty means unconstrained."""
+    year_min: int = None
+    year_max: int = None
+    committees: tuple = ()
+    ics_prefixes: tuple = ()
+
+    def __post_init__(self):
+        # Tuples of normalized values, so filters are hashable cache keys
+        if isinstance(self.committees, str):
+            object.__setattr__(self, "committees", (self.committees,))
+        if isinstance(self.ics_prefixes, str):
+            object.__setattr__(self, "ics_prefixes", (self.ics_prefixes,))
+        object.__setattr__(self, "committees", tuple(normalize_committee(c) for c in self.committees))
+        object.__setattr__(self, "ics_prefixes", tuple(normalize_ics_prefix(p) for p in self.ics_prefixes))
+
+    def __bool__(self):
+        return bool(self.year_min is not None or self.year_max is not None or self.committees or self.ics_prefixes)
+
+
+def parse_filters(question):
+    """
+    Constraints stated in a question: committee ("TC 307", "ISO/IEC JTC 1/SC 27"),
+    ICS code or prefix ("ICS 35", "ICS 35.030"), year range ("since 2020",
+    "between 2015 and 2020") or "recent". Returns a SearchFilters (falsy if none).
+    """
+    q = re.sub(r"\s+", " ", question.lower()).strip()
+    start, end = year_range(q)
+    if start is None and end is None and re.search(r"\brecent(?:ly)?\b", q):
+        start = time.localtime().tm_year - config.RECENT_YEARS
+    return SearchFilters(
+        year_min=start,
+        year_max=end,
+        committees=tuple(m.group(1) for m in _COMMITTEE_PATTERN.finditer(q)),
+        ics_prefixes=tuple(m.group(1) for m in _ICS_PATTERN.finditer(q)),
+    )
+
+
+def _postings(values_per_row):
+    """CSR postings: (sorted unique values, offsets, rows) from one list of values per row."""
+    pairs = sorted({(value, row) for row, values in enumerate(values_per_row) for value in values})
+    values = sorted({value for value, _ in pairs})
+    position = {value: i for i, value in enumerate(values)}
+    counts = np.bincount([position[value] for value, _ in pairs], minlength=len(values))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    rows = np.array([row for _, row in pairs], dtype=np.int32)
+    encoded = [v.encode("utf-8") for v in values]
+    width = max((len(v) for v in encoded), default=1) or 1
+    return np.array(encoded, dtype=f"S{width}"), offsets, rows
+
+
+def build_filter_arrays(years, committees, ics_codes):
+    """
+    Metadata index stored next to the vectors (rows in index order):
+    publication year per row (0 = unknown) and postings lists of the rows of
+    each committee and each ICS code. ICS values are sorted, so the codes
+    under a prefix are one contiguous range of postings.
+    """
+    years = np.nan_to_num(np.asarray(years, dtype=np.float64), nan=0).astype(np.int16)
+    committee_values, committee_offsets, committee_rows = _postings(
+        [[normalize_committee(c)] if isinstance(c, str) and c.strip() else [] for c in committees]
+    )
+    ics_values, ics_offsets, ics_rows = _postings([list(codes) for codes in ics_codes])
+    return {
+        "filter_year": years,
+        "committee_values": committee_values,
+        "committee_offsets": committee_offsets,
+        "committee_rows": committee_rows,
+        "ics_values": ics_values,
+        "ics_offsets": ics_offsets,
+        "ics_rows": ics_rows,
+    }
+
+
+class MetadataIndex:
+    """Evaluates SearchFilters against the arrays from build_filter_arrays."""
+
+    ARRAYS = ("filter_year", "committee_values", "committee_offsets", "committee_rows",
+              "ics_values", "ics_offsets", "ics_rows")
+
+    def __init__(self, arrays):
+        self.year = arrays["filter_year"]
+        self.committee_position = {
+            v.decode("utf-8"): i for i, v in enumerate(arrays["committee_values"].tolist())
+        }
+        self.committee_offsets = arrays["committee_offsets"]
+        self.committee_rows = arrays["committee_rows"]
+        self.ics_values = arrays["ics_values"]
+        self.ics_offsets = arrays["ics_offsets"]
+        self.ics_rows = arrays["ics_rows"]
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """None when the vector index was built without metadata arrays."""
+        if not all(name in artifact for name in cls.ARRAYS):
+            return None
+        return cls({name: artifact[name] for name in cls.ARRAYS})
+
+    def _rows_mask(self, rows):
+        mask = np.zeros(len(self.year), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def mask(self, filters):
+        """Boolean mask of the rows matching every constraint in `filters`."""
+        mask = np.ones(len(self.year), dtype=bool)
+        if filters.year_min is not None:
+            mask &= self.year >= filters.year_min
+        if filters.year_max is not None:
+            mask &= (self.year <= filters.year_max) & (self.year > 0)
+        if filters.committees:
+            rows = [
+                self.committee_rows[self.committee_offsets[i]:self.committee_offsets[i + 1]]
+                for i in (self.committee_position.get(c) for c in filters.committees) if i is not None
+            ]
+            mask &= self._rows_mask(np.concatenate(rows) if rows else [])
+        if filters.ics_prefixes:
+            rows = []
+            for prefix in filters.ics_prefixes:
+                key = prefix.encode("utf-8")
+                lo = np.searchsorted(self.ics_values, key, side="left")
+                hi = np.searchsorted(self.ics_values, key + b"\xff", side="left")
+                rows.append(self.ics_rows[self.ics_offsets[lo]:self.ics_offsets[hi]])
+            mask &= self._rows_mask(np.concatenate(rows))
+        return mask
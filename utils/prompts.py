@@ -17,6 +17,16 @@ SQL_PROMPT = """You are a SQL expert for ISO standards database.
 Schema:
 - standards: id, title_en, title_fr, abstract, publicationDate, status, icsCode, ownerCommittee, year, full_text
 - committees: id, title_en, title (raw name)
+- standard_ics: standard_id, ics_code, ics_group (one row per ICS code of a standard; ics_group = first two digits, e.g. '35')
+
+Pre-aggregated summary tables (a few hundred rows each, much faster than grouping standards):
+- agg_year: year, count
+- agg_committee: ownerCommittee, count
+- agg_committee_year: ownerCommittee, year, count
+- agg_ics_group: ics_group, count
+- agg_ics_group_year: ics_group, year, count
+For counts by year, committee or ICS group (and combinations with a year range), use these tables
+(SUM(count) when combining rows) instead of COUNT(*) on standards.
 
 User question: {query}
 
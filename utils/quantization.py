@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class VectorStore:
+    """
+    Read-only matrix of embeddings stored as float32, float16 or int8 codes
+    with one float32 scale per vector.
+
+    Slicing and `@` dequantize block by block, so scoring never materializes
+    the full float32 matrix and memory-mapped files stay shared between
+    processes through the OS page cache.
+    """
+
+    def __init__(self, data, scales=None, block_size=8192):
+        self.data = data
+        self.scales = scales
+        self.block_size = block_size
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def size(self):
+        return self.data.size
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        block = np.asarray(self.data[key], dtype=np.float32)
+        if self.scales is not None:
+            scales = self.scales[key]
+            block = block * (scales[..., None] if block.ndim > 1 else scales)
+        return block
+
+    def __matmul__(self, other):
+        if self.data.dtype == np.float32 and self.scales is None:
+            return self.data @ other
+        out_shape = (len(self),) + np.shape(other)[1:]
+        out = np.empty(out_shape, dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            end = min(start + self.block_size, len(self))
+            block = self.data[start:end].astype(np.float32) @ other
+            if self.scales is not None:
+                # Scaling the scores is cheaper than dequantizing the block
+                block *= self.scales[start:end].reshape((-1,) + (1,) * (block.ndim - 1))
+            out[start:end] = block
+        return out
+
+
+def quantize_int8(embeddings):
+    """Symmetric per-vector int8 quantization. Returns (codes, scales)."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
@@ -0,0 +1,76 @@
+import re
+import sqlite3
+import config
+from utils.db import get_connection
+
+FTS_TABLE = "standards_fts"
+
+# Common question words that only add noise to BM25 matching
+STOPWORDS = {
+    "a", "an", "and", "are", "about", "by", "do", "does", "explain", "for",
+    "from", "how", "in", "is", "me", "of", "on", "or", "show", "standard",
+    "standards", "tell", "the", "to", "what", "which", "with",
+}
+
+
+def fts_query(text):
+    """Turn free text into a safe FTS5 OR-query of quoted tokens."""
+    tokens = [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(tokens))
+
+
+def reciprocal_rank_fusion(rankings, weights, k=60):
+    """
+    Fuse ranked id lists: score(id) = sum(weight / (k + rank)).
+    `rankings` and `weights` are dicts keyed by signal name.
+    """
+    scores = {}
+    for name, ids in rankings.items():
+        weight = weights.get(name, 0.0)
+        for rank, doc_id in enumerate(ids, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever:
+    """
+    Dense (EmbeddingEngine) + lexical (SQLite FTS5 / BM25) retrieval fused
+    with reciprocal-rank fusion. A signal with weight 0 is not computed, so
+    `{"dense": 0}` skips the model encode entirely. Search filters apply to
+    both signals.
+    """
+
+    def __init__(self, embedding_engine, weights=None):
+        self.embedding_engine = embedding_engine
+        self.weights = {**config.RETRIEVAL_WEIGHTS, **(weights or {})}
+
+    def lexical_search(self, query, top_k=5):
+        match = fts_query(query)
+        if not match:
+            return []
+        try:
+            # bm25() is lower-is-better; titles weigh more than the full text
+            cursor = get_connection().execute(
+                f"SELECT id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? "
+                f"ORDER BY bm25({FTS_TABLE}, 0.0, {config.BM25_TITLE_WEIGHT}, 1.0) LIMIT ?",
+                (match, top_k),
+            )
+            return [row[0] for row in cursor.fetchall()]
+        except sqlite3.OperationalError as e:
+            # Database built before the FTS index existed
+            print(f"Lexical search unavailable: {e}")
+            return []
+
+    def dense_search(self, query, top_k=5, filters=None):
+        return self.embedding_engine.search(query, top_k=top_k, filters=filters)
+
+    def search(self, query, top_k=5, filters=None):
+        n_candidates = max(top_k, config.RETRIEVAL_CANDIDATES)
+        rankings = {}
+        if self.weights.get("dense", 0) > 0:
+            rankings["dense"] = self.dense_search(query, n_candidates, filters)
+        if self.weights.get("bm25", 0) > 0:
+            ids = self.lexical_search(query, n_candidates)
+            rankings["bm25"] = self.embedding_engine.filter_ids(ids, filters) if filters else ids
+        fused = reciprocal_rank_fusion(rankings, self.weights, k=config.RRF_K)
+        return fused[:top_k]
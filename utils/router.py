@@ -0,0 +1,186 @@
+import threading
+import time
+import numpy as np
+import config
+
+# Agents each route runs (synthesis always runs)
+ROUTES = {
+    "rag": ("rag",),
+    "sql": ("sql",),
+    "viz": ("sql", "viz"),
+    "all": ("sql", "rag", "viz"),
+}
+AGENT_STAGES = ("sql", "rag", "viz")
+
+# Labelled questions the route centroids are computed from. A held-out set
+# is in benchmarks/bench_router.py.
+EXAMPLES = {
+    "rag": [
+        "Explain ISO 14001",
+        "What is ISO 9001 about?",
+        "Which standards cover information security management?",
+        "Find standards about artificial intelligence risk management",
+        "What does ISO 45001 require for occupational health and safety?",
+        "Summarize the scope of ISO 27001",
+        "Standards for medical device quality management",
+        "Is there a standard for energy management systems?",
+        "Which ISO standard deals with food safety?",
+        "Tell me about ISO 50001",
+        "What are the requirements for testing and calibration laboratories?",
+        "Recommend standards for cloud computing privacy",
+        "Describe the ISO standard for environmental labels",
+        "Which standards apply to electric vehicle batteries?",
+        "What is the difference between ISO 9001 and ISO 9004?",
+        "Guidelines for risk management",
+        "Standards related to road vehicle functional safety",
+        "Which standard defines date and time formats?",
+        "What does ISO 31000 say about risk assessment?",
+        "Find standards on water quality sampling",
+    ],
+    "sql": [
+        "How many standards are there?",
+        "How many standards were published in 2020?",
+        "Which committee has the most standards?",
+        "Count the standards of ISO/TC 176",
+        "List the 10 committees with the most standards",
+        "How many standards does TC 207 own?",
+        "What is the total number of standards in ICS group 35?",
+        "Which ICS group contains the most standards?",
+        "How many committees are there?",
+        "List the standards published by JTC 1/SC 27 since 2022",
+        "What is the oldest standard in the database?",
+        "How many standards were published between 2015 and 2020?",
+        "Number of standards per status",
+        "Which year had the most publications?",
+        "List the latest 5 standards",
+        "How many standards mention cybersecurity in their title?",
+        "Top 5 ICS groups by number of standards",
+        "Give me the count of standards owned by ISO/TC 22",
+        "What is the average number of standards per committee?",
+        "Which committees published more than 100 standards?",
+    ],
+    "viz": [
+        "Show the evolution of publications per year",
+        "Plot the number of standards per year since 2000",
+        "Chart the top 10 committees by number of standards",
+        "Visualize the distribution of standards across ICS groups",
+        "Show a timeline of ISO/TC 211 publications",
+        "Graph the trend of new standards over the last decade",
+        "Draw a bar chart of standards per committee",
+        "Show me a pie chart of standards by status",
+        "How has the number of standards evolved over time?",
+        "Display the yearly publication trend for ICS 35",
+        "Plot publications per year for TC 176",
+        "Visualize how many standards each committee published in 2023",
+        "Show the growth of standards since 1990 on a chart",
+        "Trend of publications by ICS group over the years",
+        "Compare committees in a chart",
+        "Histogram of publication years",
+        "Show the breakdown of standards by ICS group",
+        "Chart the number of standards per decade",
+        "Line chart of standards published each year",
+        "Visual overview of publications per committee",
+    ],
+    "all": [
+        "How many AI standards exist and what do they cover?",
+        "Show the trend of cybersecurity standards and explain the key ones",
+        "Which committees work on sustainability and what are their main standards?",
+        "Give me an overview of quality management standards with statistics",
+        "How many standards deal with medical devices and which are the most important?",
+        "Analyze the evolution of environmental standards and describe the main ones",
+        "What are the most recent information security standards and how many were published each year?",
+        "Compare the number of energy standards per year and summarize their content",
+        "Which committee publishes the most on road vehicles and what do those standards cover?",
+        "Give me statistics and examples of standards about smart cities",
+        "Overview of food safety standards: counts, trend and key documents",
+        "How active is TC 307 on blockchain and what are its standards about?",
+        "Tell me about standards for robotics, how many there are and their trend",
+        "Analyze the landscape of privacy standards",
+        "What is the state of standardization in artificial intelligence?",
+        "Report on water quality standards with figures",
+        "How did cloud computing standards grow and which ones matter most?",
+        "Explain the main occupational health standards and chart them by year",
+        "Summarize standards activity in nanotechnology",
+        "Give me an analysis of the biggest committees and their flagship standards",
+    ],
+}
+
+
+class QueryRouter:
+    """
+    Picks the agents a question needs (see ROUTES) by nearest centroid:
+    the query embedding (from the EmbeddingEngine query cache, so the RAG
+    search and the answer cache reuse it) is compared to the mean embedding
+    of each route's example questions. When the two closest routes are
+    within ROUTER_MIN_MARGIN the question is ambiguous and every agent runs.
+
+    Also keeps the stats shown in the sidebar: routes taken, routing time and
+    the agent time avoided (skipped stages x their average observed duration).
+    """
+
+    def __init__(self, embedding_engine, examples=None, min_margin=None):
+        self.embedding_engine = embedding_engine
+        self.examples = examples or EXAMPLES
+        self.min_margin = config.ROUTER_MIN_MARGIN if min_margin is None else min_margin
+        self.labels = list(self.examples)
+        self.centroids = None
+        self.routes = {}
+        self.route_seconds = 0.0
+        self.stage_calls = {}
+        self.stage_seconds = {}
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def fit(self):
+        """Encode the examples once (at startup, or on the first question)."""
+        with self._lock:
+            if self.centroids is None:
+                texts = [text for label in self.labels for text in self.examples[label]]
+                vectors = self.embedding_engine.model.encode(texts, normalize_embeddings=True)
+                centroids, start = [], 0
+                for label in self.labels:
+                    end = start + len(self.examples[label])
+                    centroid = vectors[start:end].mean(axis=0)
+                    centroids.append(centroid / np.linalg.norm(centroid))
+                    start = end
+                self.centroids = np.stack(centroids).astype(np.float32)
+        return self
+
+    def classify(self, query):
+        """(route, similarity to each route's centroid)."""
+        self.fit()
+        scores = self.centroids @ self.embedding_engine.encode_query(query)
+        first, second = np.argsort(-scores)[:2]
+        route = self.labels[first] if scores[first] - scores[second] >= self.min_margin else "all"
+        return route, dict(zip(self.labels, scores.tolist()))
+
+    def route(self, query):
+        """Route name for `query`; "all" (every agent) if routing fails."""
+        start = time.perf_counter()
+        try:
+            route, _ = self.classify(query)
+        except Exception as e:
+            print(f"Routing failed ({e}), running every agent")
+            route = "all"
+        with self._lock:
+            self.routes[route] = self.routes.get(route, 0) + 1
+            self.route_seconds += time.perf_counter() - start
+            for stage in AGENT_STAGES:
+                if stage not in ROUTES[route] and self.stage_calls.get(stage):
+                    self.saved_seconds += self.stage_seconds[stage] / self.stage_calls[stage]
+        return route
+
+    def record_stage(self, stage, seconds):
+        """Duration of a stage that ran, for the time-saved estimate."""
+        with self._lock:
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def stats(self):
+        with self._lock:
+            calls = sum(self.routes.values())
+            return {
+                "routes": dict(self.routes),
+                "avg_route_ms": 1000 * self.route_seconds / calls if calls else None,
+                "saved_seconds": self.saved_seconds,
+            }
@@ -0,0 +1,98 @@
+import threading
+import time
+import numpy as np
+import config
+from utils.db import db_signature
+from utils.sql_templates import question_specifics
+
+
+class SemanticCache:
+    """
+    Answers to previous questions, looked up by embedding similarity so that
+    paraphrases of a question hit the same entry. A hit also needs the same
+    numbers and standard / committee references ("published in 2019" vs
+    "in 2020", "ISO 9001" vs "ISO 14001"), which similarity alone misses.
+
+    Vectors live in one preallocated matrix, so a lookup is a single
+    matrix-vector product. Entries expire after `ttl` seconds, the least
+    recently used entry is evicted when full, and everything is dropped
+    when the database or the embeddings change.
+    """
+
+    def __init__(self, embedding_engine, threshold=None, maxsize=None, ttl=None):
+        self.embedding_engine = embedding_engine
+        self.threshold = threshold or config.ANSWER_CACHE_THRESHOLD
+        self.maxsize = maxsize or config.ANSWER_CACHE_SIZE
+        self.ttl = ttl or config.ANSWER_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._payloads = [None] * self.maxsize
+        self._questions = [None] * self.maxsize
+        self._specifics = np.zeros(self.maxsize, dtype=np.int64)  # hash of question_specifics
+        self._expires = np.zeros(self.maxsize)
+        self._last_used = np.zeros(self.maxsize)
+        self._version = self._dataset_version()
+
+    def _dataset_version(self):
+        return (db_signature(), self.embedding_engine.data_version)
+
+    def _check_version(self):
+        self.embedding_engine.check_data_version()
+        version = self._dataset_version()
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._payloads = [None] * self.maxsize
+            self._questions = [None] * self.maxsize
+            self._expires[:] = 0
+            self._last_used[:] = 0
+
+    def lookup(self, question):
+        """Return (payload, matched_question, similarity) or None."""
+        self._check_version()
+        vector = self.embedding_engine.encode_query(question)
+        specifics = hash(question_specifics(question))
+        now = time.monotonic()
+        with self._lock:
+            candidates = (self._expires > now) & (self._specifics == specifics)
+            if self._vectors is None or not candidates.any():
+                self.misses += 1
+                return None
+            scores = np.where(candidates, self._vectors @ vector, -np.inf)
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.misses += 1
+                return None
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._payloads[slot], self._questions[slot], float(scores[slot])
+
+    def store(self, question, payload):
+        vector = self.embedding_engine.encode_query(question)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+            # Free (or expired) slot first, otherwise the least recently used one
+            expired = np.flatnonzero(self._expires <= now)
+            slot = int(expired[0]) if len(expired) else int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._payloads[slot] = payload
+            self._questions[slot] = question
+            self._specifics[slot] = hash(question_specifics(question))
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": int((self._expires > time.monotonic()).sum()),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
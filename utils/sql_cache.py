@@ -0,0 +1,122 @@
+import re
+import threading
+import pyarrow as pa
+import config
+from utils.cache import LRUCache
+from utils.db import db_signature, result_columns
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+      (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<ident>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+    | (?P<hex>0[xX][0-9a-fA-F]+)
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+    | (?P<word>\w+)
+    | (?P<op>\|\||<=|>=|<>|!=|==|[^\s\w])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+def canonicalize_sql(sql):
+    """
+    Canonical form of a query for cache keys: comments and redundant
+    whitespace removed, bare keywords and identifiers lowercased (SQLite
+    treats them case-insensitively), numeric (and hex) literals normalized
+    and a trailing semicolon dropped. String literals and quoted tokens are kept
+    verbatim: SQLite reads a "..." that names no column as a string
+    literal, and comparisons on strings are case-sensitive.
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind == "comment":
+            continue
+        if kind == "hex":
+            text = hex(int(text, 16))
+        elif kind == "number":
+            if re.fullmatch(r"\d+", text):
+                text = str(int(text))
+            else:
+                text = repr(float(text))
+        elif kind == "word":
+            text = text.lower()
+        tokens.append(text)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def _serialize(df):
+    # Arrow IPC stream with zstd: compact and fast to round-trip to pandas
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _deserialize(buf):
+    return pa.ipc.open_stream(buf).read_all().to_pandas()
+
+
+class SQLResultCache:
+    """
+    Results of generated SQL, keyed on canonicalized query text and stored
+    as compressed Arrow buffers under a byte budget with LRU eviction.
+    Cleared automatically when the database file changes.
+
+    Queries sharing a key can still name their columns differently (SQLite
+    names an unaliased column after its text as written, e.g. "Year" or
+    "COUNT( * )"), so a hit from a differently written query gets the
+    column names that query returns.
+    """
+
+    def __init__(self, max_bytes=None, maxsize=None, ttl=None):
+        self.cache = LRUCache(
+            maxsize=maxsize or config.SQL_CACHE_MAX_ENTRIES,
+            ttl=ttl if ttl is not None else config.SQL_CACHE_TTL,
+            max_bytes=max_bytes or config.SQL_CACHE_MAX_BYTES,
+        )
+        self._db_version = db_signature()
+        self._lock = threading.Lock()
+
+    def _check_db_version(self):
+        version = db_signature()
+        if version != self._db_version:
+            with self._lock:
+                if version != self._db_version:
+                    self.cache.clear()
+                    self._db_version = version
+
+    def get(self, sql):
+        """Return (DataFrame, meta) for a cached query, or None."""
+        self._check_db_version()
+        entry = self.cache.get(canonicalize_sql(sql))
+        if entry is None:
+            return None
+        buf, meta, cached_sql = entry
+        df = _deserialize(buf)
+        if sql != cached_sql:
+            try:
+                columns = result_columns(sql)
+            except Exception as e:
+                print(f"Cached result not reusable: {e}")
+                return None
+            if len(columns) != len(df.columns):
+                return None
+            df.columns = columns
+        return df, dict(meta)
+
+    def put(self, sql, df, meta=None):
+        try:
+            buf = _serialize(df)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            print(f"Result not cacheable: {e}")
+            return
+        self.cache.put(canonicalize_sql(sql), (buf, meta or {}, sql), size=buf.size)
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,194 @@
+import re
+import threading
+from dataclasses import dataclass
+
+# Words a template question may contain. Any other content word (a topic such
+# as "AI" or "cybersecurity", a committee name...) means the question is more
+# specific than the template, so it is left to the LLM.
+COMMON_WORDS = {
+    "a", "all", "an", "and", "are", "as", "been", "by", "can", "chart", "count",
+    "display", "do", "does", "each", "for", "from", "give", "graph", "has",
+    "have", "how", "in", "is", "iso", "list", "many", "me", "number", "of",
+    "over", "plot", "please", "published", "publication", "show", "standard",
+    "standards", "the", "there", "to", "total", "us", "was", "were", "what",
+    "which", "with",
+}
+
+RANGE_WORDS = {"between", "since", "after", "before", "until", "during", "year", "years"}
+
+YEAR = r"((?:19|20)\d{2})"
+
+# Standard or committee references ("ISO 27001", "TC 307", "ISO/IEC JTC 1/SC 27"):
+# the question is about one document or committee, never a whole-corpus template
+REFERENCE = re.compile(r"\b(?:iso|iec|tc|sc|jtc|wg)\s*[/-]?\s*\d+|\d+:\d{4}\b")
+
+
+# Breakdowns a question can ask for. A template whose result is not broken
+# down that way ("most active committees by year") would answer another question
+GROUPINGS = {
+    "year": re.compile(r"\b(?:per|by|each|every)\s+years?\b|\b(?:yearly|annual|annually|evolution|trends?|over time|timeline)\b"),
+    "ics": re.compile(r"\b(?:per|by|each)\s+(?:ics|fields?|sectors?|domains?|groups?)\b"),
+    "committee": re.compile(r"\b(?:per|by|each)\s+(?:committees?|tcs?)\b"),
+}
+
+
+def question_specifics(question):
+    """
+    Numbers and standard / committee references of a question ("2019",
+    "iso9001", "tc307"). Questions that differ only in these embed almost
+    identically but need different answers.
+    """
+    q = question.lower()
+    references = {re.sub(r"[\s/-]+", "", m.group()) for m in REFERENCE.finditer(q)}
+    return frozenset(references | set(re.findall(r"\d+", q)))
+
+
+@dataclass
+class TemplateMatch:
+    name: str
+    sql: str
+
+
+def year_range(question):
+    """(start, end) years mentioned in the question, either may be None."""
+    if m := re.search(rf"\bbetween\s+{YEAR}\s+and\s+{YEAR}\b", question):
+        return int(m.group(1)), int(m.group(2))
+    if m := re.search(rf"\bfrom\s+{YEAR}\s+to\s+{YEAR}\b", question):
+        return int(m.group(1)), int(m.group(2))
+    if m := re.search(rf"\b(?:since|after)\s+{YEAR}\b", question):
+        return int(m.group(1)), None
+    if m := re.search(rf"\b(?:before|until)\s+{YEAR}\b", question):
+        return None, int(m.group(1))
+    if m := re.search(rf"\b(?:in|during)\s+{YEAR}\b", question):
+        return int(m.group(1)), int(m.group(1))
+    return None, None
+
+
+# Templates read the agg_* summary tables built by prepare_data.py
+
+def _year_filter(start, end, column="year"):
+    conditions = []
+    if start is not None:
+        conditions.append(f"{column} >= {start}")
+    if end is not None:
+        conditions.append(f"{column} <= {end}")
+    return conditions
+
+
+def _top_committees(question, start, end):
+    if not re.search(r"\b(committees?|tcs?)\b", question):
+        return None
+    if not re.search(r"\b(top|most active|most productive|largest|biggest|leading)\b", question):
+        return None
+    m = re.search(r"\btop\s+(\d{1,3})\b", question)
+    n = int(m.group(1)) if m else 10
+    if start is not None or end is not None:
+        where = " AND ".join(_year_filter(start, end))
+        return (
+            "SELECT ownerCommittee, SUM(count) AS count FROM agg_committee_year "
+            f"WHERE {where} GROUP BY ownerCommittee ORDER BY count DESC LIMIT {n}"
+        )
+    return f"SELECT ownerCommittee, count FROM agg_committee ORDER BY count DESC LIMIT {n}"
+
+
+def _count_per_year(question, start, end):
+    if not re.search(r"\b(evolution|trend|trends|per year|by year|each year|every year|over time|timeline|yearly|annual)\b", question):
+        return None
+    where = " AND ".join(_year_filter(start, end))
+    return "SELECT year, count FROM agg_year " + (f"WHERE {where} " if where else "") + "ORDER BY year"
+
+
+def _count_per_ics(question, start, end):
+    if not re.search(r"\b(ics|fields?|sectors?|domains?|groups?)\b", question):
+        return None
+    if not re.search(r"\b(per|by|each|distribution|breakdown|split)\b", question):
+        return None
+    if start is not None or end is not None:
+        where = " AND ".join(_year_filter(start, end))
+        return (
+            "SELECT ics_group, SUM(count) AS count FROM agg_ics_group_year "
+            f"WHERE {where} GROUP BY ics_group ORDER BY count DESC"
+        )
+    return "SELECT ics_group, count FROM agg_ics_group ORDER BY count DESC"
+
+
+def _count_in_range(question, start, end):
+    if start is None and end is None:
+        return None
+    if not re.search(r"\b(how many|number of|count|total)\b", question):
+        return None
+    where = " AND ".join(_year_filter(start, end))
+    return f"SELECT COALESCE(SUM(count), 0) AS count FROM agg_year WHERE {where}"
+
+
+# Checked in order: the first template that produces SQL wins.
+# (name, builder, extra words allowed, groupings the result has)
+TEMPLATES = [
+    ("top_committees", _top_committees, {"top", "most", "active", "productive", "largest", "biggest", "leading", "technical", "committee", "committees", "tc", "tcs"}, {"committee"}),
+    ("count_per_year", _count_per_year, {"evolution", "trend", "trends", "per", "by", "each", "every", "over", "time", "timeline", "yearly", "annual"}, {"year"}),
+    ("count_per_ics", _count_per_ics, {"ics", "field", "fields", "sector", "sectors", "domain", "domains", "group", "groups", "code", "codes", "per", "by", "each", "distribution", "breakdown", "split"}, {"ics"}),
+    ("count_in_range", _count_in_range, set(), set()),
+]
+
+
+def match_template(question):
+    """
+    Return a TemplateMatch when the question confidently maps to one of the
+    analytics templates, otherwise None.
+    """
+    q = re.sub(r"\s+", " ", question.lower()).strip()
+    if REFERENCE.search(q):
+        return None
+    start, end = year_range(q)
+    # Numbers are words too: only the parsed years and a "top N" count are known
+    words = set(re.findall(r"[a-z]+|\d+", q))
+    known_numbers = {str(year) for year in (start, end) if year is not None}
+    known_numbers.update(re.findall(r"\btop\s+(\d{1,3})\b", q))
+    groupings = {name for name, pattern in GROUPINGS.items() if pattern.search(q)}
+    for name, build, vocabulary, grouped_by in TEMPLATES:
+        sql = build(q, start, end)
+        if sql is None:
+            continue
+        if words - COMMON_WORDS - RANGE_WORDS - vocabulary - known_numbers:
+            # Extra topic words or numbers: the template would ignore them
+            return None
+        if groupings - grouped_by:
+            # A breakdown the template's result doesn't have
+            return None
+        return TemplateMatch(name, sql)
+    return None
+
+
+class TemplateStats:
+    """Requests served by templates and LLM latency they avoided."""
+
+    def __init__(self):
+        self.served = {}
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_llm(self, seconds):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+    def record_template(self, name, seconds):
+        """Record a template hit; returns the estimated seconds saved (or None)."""
+        with self._lock:
+            self.served[name] = self.served.get(name, 0) + 1
+            if not self.llm_calls:
+                return None
+            saved = self.llm_seconds / self.llm_calls - seconds
+            self.saved_seconds += saved
+            return saved
+
+    def stats(self):
+        with self._lock:
+            return {
+                "served": dict(self.served),
+                "llm_calls": self.llm_calls,
+                "avg_llm_seconds": self.llm_seconds / self.llm_calls if self.llm_calls else None,
+                "saved_seconds": self.saved_seconds,
+            }
@@ -0,0 +1,40 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Records the wall-clock cost of each import / initialization step."""
+
+    def __init__(self):
+        self.steps = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.steps.append({
+                    "step": name,
+                    "seconds": elapsed,
+                    "thread": threading.current_thread().name,
+                    "finished_at": time.perf_counter() - self._origin,
+                })
+
+    def report(self):
+        """Plain-text table of recorded steps, slowest first."""
+        with self._lock:
+            steps = sorted(self.steps, key=lambda s: s["seconds"], reverse=True)
+        lines = [f"{'step':<40}{'seconds':>9}{'at':>9}  thread"]
+        for s in steps:
+            lines.append(f"{s['step']:<40}{s['seconds']:>9.3f}{s['finished_at']:>9.2f}  {s['thread']}")
+        return "\n".join(lines)
+
+
+# Process-wide timer shared by app.py and the modules it loads lazily
+startup_timer = StartupTimer()
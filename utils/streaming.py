@@ -0,0 +1,68 @@
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+def _partial_tag_length(text, tag):
+    """Length of the longest suffix of `text` that is a prefix of `tag`."""
+    for n in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:n]):
+            return n
+    return 0
+
+
+class ThinkStripper:
+    """
+    Incrementally removes <think>...</think> blocks from a token stream.
+
+    Tags may be split across chunks: a trailing fragment that could be the
+    start of a tag is held back until the next chunk decides it. Leading
+    whitespace of the visible answer is dropped, like the `.strip()` applied
+    to non-streamed completions.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_think = False
+        self.started = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        out = []
+        while self.buffer:
+            if self.in_think:
+                end = self.buffer.find(THINK_CLOSE)
+                if end == -1:
+                    keep = _partial_tag_length(self.buffer, THINK_CLOSE)
+                    self.buffer = self.buffer[len(self.buffer) - keep:] if keep else ""
+                    break
+                self.buffer = self.buffer[end + len(THINK_CLOSE):]
+                self.in_think = False
+            else:
+                start = self.buffer.find(THINK_OPEN)
+                if start == -1:
+                    keep = _partial_tag_length(self.buffer, THINK_OPEN)
+                    out.append(self.buffer[:len(self.buffer) - keep])
+                    self.buffer = self.buffer[len(self.buffer) - keep:] if keep else ""
+                    break
+                out.append(self.buffer[:start])
+                self.buffer = self.buffer[start + len(THINK_OPEN):]
+                self.in_think = True
+        return self._visible("".join(out))
+
+    def flush(self):
+        # An unterminated think block is dropped, a dangling "<thi" is text
+        tail = "" if self.in_think else self.buffer
+        self.buffer = ""
+        return self._visible(tail)
+
+    def _visible(self, text):
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
+
+
+def strip_think(text):
+    """Remove think blocks from a complete answer (same rules as ThinkStripper)."""
+    stripper = ThinkStripper()
+    return (stripper.feed(text) + stripper.flush()).strip()
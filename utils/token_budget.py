@@ -0,0 +1,128 @@
+import re
+import config
+
+# Word pieces and punctuation marks, roughly how BPE tokenizers split text
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = " …"
+
+
+def _piece_tokens(piece):
+    return -(-len(piece) // _CHARS_PER_TOKEN)
+
+
+def estimate_tokens(text):
+    """Local token estimate: one per punctuation mark, one per ~4 characters of a word."""
+    return sum(_piece_tokens(piece) for piece in _TOKEN_PATTERN.findall(str(text)))
+
+
+def fits(text, max_tokens):
+    """Whether `text` is within `max_tokens` (None = unbounded)."""
+    return max_tokens is None or estimate_tokens(text) <= max_tokens
+
+
+def truncate_tokens(text, max_tokens):
+    """`text` cut (with a trailing mark) so its estimate is at most `max_tokens` (None = unbounded)."""
+    text = str(text)
+    if fits(text, max_tokens):
+        return text
+    if max_tokens <= 0:
+        return ""
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens - 1:  # keep a token for the mark
+            return text[:match.start()].rstrip() + TRUNCATION_MARK
+    return text
+
+
+def pack_blocks(blocks, max_tokens, separator="\n\n"):
+    """
+    Join `blocks` (e.g. one per retrieved document, in rank order) within
+    `max_tokens`: blocks over an equal share of the budget are cut, and the
+    share left unused by short blocks goes to the longer ones. With
+    `max_tokens` None every block is kept whole.
+    """
+    if max_tokens is None:
+        return separator.join(blocks)
+    sizes = [estimate_tokens(block) for block in blocks]
+    if sum(sizes) <= max_tokens:
+        return separator.join(blocks)
+    caps = {}
+    remaining = max_tokens
+    for i in sorted(range(len(blocks)), key=sizes.__getitem__):
+        caps[i] = min(sizes[i], remaining // (len(blocks) - len(caps)))
+        remaining -= caps[i]
+    return separator.join(truncate_tokens(block, caps[i]) for i, block in enumerate(blocks) if caps[i] > 0)
+
+
+def _format_value(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def column_stats(df):
+    """One line per column: range/mean/sum for numbers, distinct count and top values otherwise."""
+    lines = [f"{len(df)} rows, {len(df.columns)} columns."]
+    for col in df.columns:
+        series = df[col]
+        nulls = int(series.isna().sum())
+        values = series.dropna()
+        if series.dtype.kind in "iuf" and len(values):
+            line = (f"min {_format_value(values.min())}, max {_format_value(values.max())}, "
+                    f"mean {_format_value(float(values.mean()))}, sum {_format_value(values.sum())}")
+        else:
+            top = values.astype(str).value_counts().head(3)
+            line = f"{values.nunique()} distinct, most frequent: " + ", ".join(
+                f"{truncate_tokens(value, 20)} ({count})" for value, count in top.items()
+            )
+        lines.append(f"- {col}: {line}" + (f", {nulls} empty" if nulls else ""))
+    return "\n".join(lines)
+
+
+def summarize_dataframe(df, max_tokens, rows=None):
+    """
+    Markdown for a SQL result within `max_tokens`: the whole table if it
+    fits, otherwise its first and last rows (fewer until they fit) plus
+    column statistics computed over every row. With `max_tokens` None
+    large results still get the first / last rows and statistics.
+    """
+    rows = rows or config.SQL_SUMMARY_ROWS
+    if len(df) <= 2 * rows:
+        text = df.to_markdown(index=False)
+        if fits(text, max_tokens):
+            return text
+    stats = "Column statistics (all rows): " + column_stats(df)
+    n = min(rows, len(df) // 2)
+    while n > 0:
+        text = (f"First {n} rows:\n{df.head(n).to_markdown(index=False)}\n\n"
+                f"Last {n} rows:\n{df.tail(n).to_markdown(index=False)}\n\n{stats}")
+        if fits(text, max_tokens):
+            return text
+        n //= 2
+    return truncate_tokens(stats, max_tokens)
+
+
+def section_budget(prompt, section):
+    """Token budget of one section of a prompt template (None = unbounded)."""
+    return config.PROMPT_BUDGETS.get(prompt, {}).get(section)
+
+
+def prompt_messages(prompt, template, query, **sections):
+    """
+    Chat messages for `template` (system) and the user question, each section
+    cut to its budget from config.PROMPT_BUDGETS[prompt]. Logs the estimated
+    prompt size per section.
+    """
+    values = {"query": query, **sections}
+    for section, value in values.items():
+        budget = section_budget(prompt, section)
+        if budget is not None:
+            values[section] = truncate_tokens(value, budget)
+    system = template.format(**values)
+    total = estimate_tokens(system) + estimate_tokens(values["query"])
+    detail = ", ".join(f"{section} {estimate_tokens(value)}" for section, value in values.items())
+    print(f"Prompt {prompt}: ~{total} tokens ({detail})")
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": values["query"]},
+    ]
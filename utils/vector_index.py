@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"OSIVIDX\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sIQ")  # magic, format version, header length
+
+# Arrays holding the vectors in each storage dtype (codes, scales)
+STORAGE_ARRAYS = {
+    "float32": ("vectors", None),
+    "float16": ("vectors_f16", None),
+    "int8": ("vectors_int8", "vectors_int8_scales"),
+}
+
+
+class VectorIndexError(Exception):
+    """The artifact is missing, corrupt, of another format or built for another model."""
+
+
+def encode_ids(ids):
+    """Compact fixed-width UTF-8 array of ids (memory-mappable)."""
+    encoded = [str(doc_id).encode("utf-8") for doc_id in ids]
+    width = max((len(b) for b in encoded), default=1) or 1
+    return np.array(encoded, dtype=f"S{width}")
+
+
+def decode_ids(ids):
+    return [b.decode("utf-8") for b in np.atleast_1d(ids).tolist()]
+
+
+def content_hash(arrays):
+    """blake2b over array names, dtypes, shapes and bytes, in name order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}|{array.dtype.str}|{array.shape}".encode("utf-8"))
+        flat = array.reshape(-1).view(np.uint8)
+        for start in range(0, len(flat), 1 << 24):
+            digest.update(flat[start:start + (1 << 24)])
+    return digest.hexdigest()
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_vector_index(path, arrays, model, normalized=True):
+    """
+    Write `arrays` (name -> ndarray, "vectors" required) and their metadata
+    to a single file, atomically. Returns the metadata.
+
+    Layout: magic, format version, header length, JSON header, then every
+    array at a 64-byte aligned offset (relative to the end of the header),
+    so the whole file is opened with one memory map and arrays are views.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    vectors = arrays["vectors"]
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "model": model,
+        "dim": int(vectors.shape[1]),
+        "count": int(vectors.shape[0]),
+        "normalized": bool(normalized),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "content_hash": content_hash(arrays),
+        "arrays": table,
+    }
+    header = json.dumps(metadata).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + table[name]["offset"] - f.tell()))
+            f.write(array.reshape(-1).view(np.uint8))
+    os.replace(tmp_path, path)
+    return metadata
+
+
+class VectorIndexFile:
+    """
+    Read side of the artifact written by `write_vector_index`: `metadata`
+    plus named arrays (`index["vectors"]`, `index["ids"]`...), all views of
+    a single read-only memory map (or of one in-memory read).
+    """
+
+    def __init__(self, path, metadata, arrays):
+        self.path = path
+        self.metadata = metadata
+        self.arrays = arrays
+
+    @classmethod
+    def open(cls, path, expected_model=None, mmap=True):
+        """Open the artifact; refuses other format versions and, if given, other models."""
+        if mmap:
+            buf = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            buf = np.fromfile(path, dtype=np.uint8)
+        if len(buf) < _PREAMBLE.size:
+            raise VectorIndexError(f"{path}: truncated file")
+        magic, version, header_len = _PREAMBLE.unpack(buf[:_PREAMBLE.size].tobytes())
+        if magic != MAGIC:
+            raise VectorIndexError(f"{path}: not a vector index file")
+        if version != FORMAT_VERSION:
+            raise VectorIndexError(f"{path}: format version {version}, expected {FORMAT_VERSION}")
+        metadata = json.loads(buf[_PREAMBLE.size:_PREAMBLE.size + header_len].tobytes())
+        if expected_model is not None and metadata["model"] != expected_model:
+            raise VectorIndexError(
+                f"{path}: built with model {metadata['model']!r}, expected {expected_model!r}; "
+                "rebuild it with prepare_data.py"
+            )
+
+        data_start = _align(_PREAMBLE.size + header_len)
+        arrays = {}
+        for name, spec in metadata["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = data_start + spec["offset"]
+            nbytes = int(np.prod(spec["shape"], dtype=np.int64)) * dtype.itemsize
+            if start + nbytes > len(buf):
+                raise VectorIndexError(f"{path}: truncated array {name!r}")
+            arrays[name] = buf[start:start + nbytes].view(dtype).reshape(spec["shape"])
+        return cls(path, metadata, arrays)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def get(self, name, default=None):
+        return self.arrays.get(name, default)
+
+    def verify(self):
+        """Recompute the content hash (reads the whole file)."""
+        return content_hash(self.arrays) == self.metadata["content_hash"]